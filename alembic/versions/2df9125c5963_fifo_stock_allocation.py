@@ -0,0 +1,53 @@
+"""FIFO stock allocation
+
+Revision ID: 2df9125c5963
+Revises: a6b8d9c0a59b
+Create Date: 2026-10-19 15:31:27.640592
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2df9125c5963'
+down_revision: Union[str, None] = 'a6b8d9c0a59b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+AVAILABLE_STOCK = 'NOT in_shipment AND stock_quantity > 0'
+
+
+def upgrade() -> None:
+    op.add_column('warehouse_inventory',
+                  sa.Column('batch_start_date', sa.DateTime(timezone=True),
+                            nullable=True))
+    op.execute('''
+        UPDATE warehouse_inventory wi
+        SET batch_start_date = pb.start_date
+        FROM production_batches pb
+        WHERE pb.id = wi.batch_id
+    ''')
+    op.alter_column('warehouse_inventory', 'batch_start_date',
+                    nullable=False)
+    op.create_index('ix_warehouse_inventory_fifo', 'warehouse_inventory',
+                    ['product_id', 'batch_start_date', 'id'],
+                    postgresql_where=sa.text(AVAILABLE_STOCK))
+    op.create_index('ix_warehouse_inventory_fifo_location',
+                    'warehouse_inventory',
+                    ['product_id', 'storage_location', 'batch_start_date',
+                     'id'],
+                    postgresql_where=sa.text(AVAILABLE_STOCK))
+    op.add_column('shipment_items',
+                  sa.Column('quantity', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('shipment_items', 'quantity')
+    op.drop_index('ix_warehouse_inventory_fifo_location',
+                  table_name='warehouse_inventory')
+    op.drop_index('ix_warehouse_inventory_fifo',
+                  table_name='warehouse_inventory')
+    op.drop_column('warehouse_inventory', 'batch_start_date')
@@ -0,0 +1,269 @@
+"""Daily product rollups
+
+Revision ID: 6cbc97c31d98
+Revises: 8fd7a9b32868
+Create Date: 2026-10-19 10:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6cbc97c31d98'
+down_revision: Union[str, None] = '8fd7a9b32868'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Момент завершения партии проставляет сама база: стадия меняется и
+# одиночным UPDATE через ORM, и пакетным UPDATE группового коммита.
+SET_COMPLETED_AT = '''
+CREATE OR REPLACE FUNCTION set_production_batch_completed_at()
+RETURNS trigger AS $$
+BEGIN
+    IF NEW.current_stage <> 'COMPLETED' THEN
+        NEW.completed_at := NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        NEW.completed_at := coalesce(NEW.completed_at, now());
+    ELSIF OLD.current_stage IS DISTINCT FROM 'COMPLETED' THEN
+        NEW.completed_at := now();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER production_batches_set_completed_at
+BEFORE INSERT OR UPDATE OF current_stage
+ON production_batches FOR EACH ROW
+EXECUTE FUNCTION set_production_batch_completed_at();
+'''
+
+MARK_DIRTY_FUNCTIONS = '''
+CREATE OR REPLACE FUNCTION mark_production_batch_dirty() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO analytics_dirty_buckets (product_id, day)
+        SELECT OLD.product_id, (moment AT TIME ZONE 'UTC')::date
+        FROM (VALUES (OLD.start_date), (OLD.completed_at)) AS moments (moment)
+        WHERE moment IS NOT NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO analytics_dirty_buckets (product_id, day)
+        SELECT NEW.product_id, (moment AT TIME ZONE 'UTC')::date
+        FROM (VALUES (NEW.start_date), (NEW.completed_at)) AS moments (moment)
+        WHERE moment IS NOT NULL;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION mark_inventory_dirty() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO analytics_dirty_buckets (product_id, day)
+        VALUES (OLD.product_id, (OLD.received_at AT TIME ZONE 'UTC')::date);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO analytics_dirty_buckets (product_id, day)
+        VALUES (NEW.product_id, (NEW.received_at AT TIME ZONE 'UTC')::date);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION mark_shipment_item_dirty() RETURNS trigger AS $$
+DECLARE
+    item shipment_items%ROWTYPE;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        item := OLD;
+    ELSE
+        item := NEW;
+    END IF;
+    INSERT INTO analytics_dirty_buckets (product_id, day)
+    SELECT pb.product_id, s.shipped_at::date
+    FROM shipment s
+    JOIN production_batches pb ON pb.id = item.batch_id
+    WHERE s.id = item.shipment_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION mark_shipment_dirty() RETURNS trigger AS $$
+DECLARE
+    shipment_row shipment%ROWTYPE;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        shipment_row := OLD;
+    ELSE
+        shipment_row := NEW;
+    END IF;
+    INSERT INTO analytics_dirty_buckets (product_id, day)
+    SELECT DISTINCT pb.product_id, days.day
+    FROM shipment_items si
+    JOIN production_batches pb ON pb.id = si.batch_id
+    CROSS JOIN (VALUES (OLD.shipped_at::date),
+                       (shipment_row.shipped_at::date)) AS days (day)
+    WHERE si.shipment_id = shipment_row.id AND days.day IS NOT NULL;
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+# Удаление отгрузки отмечаем в BEFORE-триггере: к AFTER-триггеру позиции
+# уже будут удалены каскадом.
+MARK_DIRTY_TRIGGERS = '''
+CREATE TRIGGER production_batches_mark_dirty
+AFTER INSERT OR DELETE OR UPDATE OF product_id, start_date, current_stage,
+    quantity_in_batch, completed_at
+ON production_batches FOR EACH ROW
+EXECUTE FUNCTION mark_production_batch_dirty();
+
+CREATE TRIGGER warehouse_inventory_mark_dirty
+AFTER INSERT OR DELETE OR UPDATE OF product_id, received_at, quantity_received,
+    batch_id
+ON warehouse_inventory FOR EACH ROW EXECUTE FUNCTION mark_inventory_dirty();
+
+CREATE TRIGGER shipment_items_mark_dirty
+AFTER INSERT OR DELETE OR UPDATE OF shipment_id, batch_id
+ON shipment_items FOR EACH ROW EXECUTE FUNCTION mark_shipment_item_dirty();
+
+CREATE TRIGGER shipment_mark_dirty
+AFTER UPDATE OF status, shipped_at
+ON shipment FOR EACH ROW EXECUTE FUNCTION mark_shipment_dirty();
+
+CREATE TRIGGER shipment_mark_dirty_on_delete
+BEFORE DELETE
+ON shipment FOR EACH ROW EXECUTE FUNCTION mark_shipment_dirty();
+'''
+
+BACKFILL_DIRTY_BUCKETS = '''
+INSERT INTO analytics_dirty_buckets (product_id, day)
+SELECT product_id, (start_date AT TIME ZONE 'UTC')::date
+FROM production_batches
+UNION
+SELECT product_id, (completed_at AT TIME ZONE 'UTC')::date
+FROM production_batches
+WHERE completed_at IS NOT NULL
+UNION
+SELECT product_id, (received_at AT TIME ZONE 'UTC')::date
+FROM warehouse_inventory
+UNION
+SELECT pb.product_id, s.shipped_at::date
+FROM shipment s
+JOIN shipment_items si ON si.shipment_id = s.id
+JOIN production_batches pb ON pb.id = si.batch_id
+'''
+
+
+def upgrade() -> None:
+    op.add_column('warehouse_inventory',
+                  sa.Column('quantity_received', sa.Integer(), nullable=True))
+    op.add_column('warehouse_inventory',
+                  sa.Column('received_at', sa.DateTime(timezone=True),
+                            nullable=True))
+    # Момент приемки раньше не хранился. Для истории берем дату запуска
+    # партии: это приближение (приемка была не раньше), но оно не
+    # сваливает всю историю приемок на день миграции.
+    op.execute('''
+        UPDATE warehouse_inventory wi
+        SET quantity_received = CASE
+                WHEN wi.in_shipment THEN pb.quantity_in_batch
+                ELSE wi.stock_quantity END,
+            received_at = pb.start_date
+        FROM production_batches pb
+        WHERE pb.id = wi.batch_id
+    ''')
+    op.execute('UPDATE warehouse_inventory SET received_at = now() '
+               'WHERE received_at IS NULL')
+    op.alter_column('warehouse_inventory', 'received_at',
+                    server_default=sa.text('now()'), nullable=False)
+
+    op.add_column('production_batches',
+                  sa.Column('completed_at', sa.DateTime(timezone=True),
+                            nullable=True))
+    # Момент завершения тоже не хранился: как и для приемки, берем дату
+    # запуска уже завершенных партий.
+    op.execute("UPDATE production_batches SET completed_at = start_date "
+               "WHERE current_stage = 'COMPLETED'")
+    op.execute("UPDATE production_batches SET completed_at = now() "
+               "WHERE current_stage = 'COMPLETED' AND completed_at IS NULL")
+
+    op.create_table('product_daily_stats',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('batches_started', sa.Integer(), nullable=False),
+    sa.Column('units_completed', sa.Integer(), nullable=False),
+    sa.Column('units_received', sa.Integer(), nullable=False),
+    sa.Column('units_shipped', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id', 'day')
+    )
+    op.create_index('ix_product_daily_stats_day', 'product_daily_stats',
+                    ['day'], unique=False)
+    op.create_table('analytics_dirty_buckets',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_index('ix_production_batches_product_id_start_date',
+                    'production_batches', ['product_id', 'start_date'])
+    op.create_index('ix_production_batches_product_id_completed_at',
+                    'production_batches', ['product_id', 'completed_at'])
+    op.create_index('ix_warehouse_inventory_product_id_received_at',
+                    'warehouse_inventory', ['product_id', 'received_at'])
+    op.create_index('ix_warehouse_inventory_batch_id',
+                    'warehouse_inventory', ['batch_id'])
+    op.create_index('ix_shipment_shipped_at', 'shipment', ['shipped_at'])
+    op.create_index('ix_shipment_items_shipment_id',
+                    'shipment_items', ['shipment_id'])
+
+    op.execute(SET_COMPLETED_AT)
+    op.execute(MARK_DIRTY_FUNCTIONS)
+    op.execute(MARK_DIRTY_TRIGGERS)
+    op.execute(BACKFILL_DIRTY_BUCKETS)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS shipment_mark_dirty_on_delete '
+               'ON shipment')
+    op.execute('DROP TRIGGER IF EXISTS shipment_mark_dirty ON shipment')
+    op.execute('DROP TRIGGER IF EXISTS shipment_items_mark_dirty '
+               'ON shipment_items')
+    op.execute('DROP TRIGGER IF EXISTS warehouse_inventory_mark_dirty '
+               'ON warehouse_inventory')
+    op.execute('DROP TRIGGER IF EXISTS production_batches_mark_dirty '
+               'ON production_batches')
+    op.execute('DROP FUNCTION IF EXISTS mark_shipment_dirty()')
+    op.execute('DROP FUNCTION IF EXISTS mark_shipment_item_dirty()')
+    op.execute('DROP FUNCTION IF EXISTS mark_inventory_dirty()')
+    op.execute('DROP FUNCTION IF EXISTS mark_production_batch_dirty()')
+    op.execute('DROP TRIGGER IF EXISTS production_batches_set_completed_at '
+               'ON production_batches')
+    op.execute('DROP FUNCTION IF EXISTS set_production_batch_completed_at()')
+
+    op.drop_index('ix_shipment_items_shipment_id', table_name='shipment_items')
+    op.drop_index('ix_shipment_shipped_at', table_name='shipment')
+    op.drop_index('ix_warehouse_inventory_batch_id',
+                  table_name='warehouse_inventory')
+    op.drop_index('ix_warehouse_inventory_product_id_received_at',
+                  table_name='warehouse_inventory')
+    op.drop_index('ix_production_batches_product_id_completed_at',
+                  table_name='production_batches')
+    op.drop_index('ix_production_batches_product_id_start_date',
+                  table_name='production_batches')
+    op.drop_table('analytics_dirty_buckets')
+    op.drop_index('ix_product_daily_stats_day',
+                  table_name='product_daily_stats')
+    op.drop_table('product_daily_stats')
+    op.drop_column('production_batches', 'completed_at')
+    op.drop_column('warehouse_inventory', 'received_at')
+    op.drop_column('warehouse_inventory', 'quantity_received')
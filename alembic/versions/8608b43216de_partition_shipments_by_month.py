@@ -0,0 +1,265 @@
+"""Partition shipments by month
+
+Revision ID: 8608b43216de
+Revises: 6cbc97c31d98
+Create Date: 2026-10-19 12:40:03.117845
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8608b43216de'
+down_revision: Union[str, None] = '6cbc97c31d98'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+# shipment и shipment_items секционируются по месяцам shipped_at.
+# Первичные и уникальные ключи секционированной таблицы обязаны включать
+# ключ секционирования, поэтому shipped_at входит в них, а shipment_items
+# получает собственную колонку shipped_at. Она заполняется по умолчанию
+# через now(), то есть временем начала транзакции, и совпадает со
+# shipped_at отгрузки, созданной в той же транзакции (как в post_order);
+# составной внешний ключ гарантирует это совпадение.
+# Уникальность order_id по всем секциям держит отдельная несекционированная
+# таблица shipment_order_ids: триггер резервирует в ней номер при вставке
+# отгрузки, внешний ключ не дает отгрузке остаться без резерва. Номера
+# архивированных отгрузок остаются занятыми.
+CREATE_PARTITIONED_TABLES = '''
+CREATE TABLE shipment_order_ids (
+    order_id varchar(255) NOT NULL,
+    CONSTRAINT shipment_order_ids_pkey PRIMARY KEY (order_id)
+);
+
+CREATE TABLE shipment (
+    order_id varchar(255) NOT NULL,
+    status varchar(50) NOT NULL,
+    shipped_at timestamp without time zone NOT NULL DEFAULT now(),
+    id integer NOT NULL DEFAULT nextval('shipment_id_seq'),
+    CONSTRAINT shipment_pkey PRIMARY KEY (id, shipped_at),
+    CONSTRAINT shipment_order_id_fkey FOREIGN KEY (order_id)
+        REFERENCES shipment_order_ids (order_id),
+    CONSTRAINT check_shipment_status
+        CHECK (status in ('PENDING', 'SHIPPED', 'CANCELLED'))
+) PARTITION BY RANGE (shipped_at);
+
+CREATE OR REPLACE FUNCTION reserve_shipment_order_id() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR NEW.order_id IS DISTINCT FROM OLD.order_id THEN
+        INSERT INTO shipment_order_ids (order_id) VALUES (NEW.order_id);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER shipment_reserve_order_id
+BEFORE INSERT OR UPDATE OF order_id ON shipment
+FOR EACH ROW EXECUTE FUNCTION reserve_shipment_order_id();
+
+CREATE INDEX ix_shipment_shipped_at ON shipment (shipped_at);
+CREATE INDEX ix_shipment_order_id ON shipment (order_id);
+
+CREATE TABLE shipment_items (
+    shipment_id integer NOT NULL,
+    batch_id integer NOT NULL,
+    id integer NOT NULL DEFAULT nextval('shipment_items_id_seq'),
+    shipped_at timestamp without time zone NOT NULL DEFAULT now(),
+    CONSTRAINT shipment_items_pkey PRIMARY KEY (id, shipped_at),
+    CONSTRAINT check_batche_shipment
+        UNIQUE (shipment_id, batch_id, shipped_at),
+    CONSTRAINT shipment_items_shipment_id_fkey
+        FOREIGN KEY (shipment_id, shipped_at)
+        REFERENCES shipment (id, shipped_at) ON DELETE CASCADE,
+    CONSTRAINT shipment_items_batch_id_fkey
+        FOREIGN KEY (batch_id)
+        REFERENCES production_batches (id) ON DELETE CASCADE
+) PARTITION BY RANGE (shipped_at);
+
+CREATE INDEX ix_shipment_items_shipment_id ON shipment_items (shipment_id);
+CREATE INDEX ix_shipment_items_batch_id ON shipment_items (batch_id);
+
+ALTER SEQUENCE shipment_id_seq OWNED BY shipment.id;
+ALTER SEQUENCE shipment_items_id_seq OWNED BY shipment_items.id;
+'''
+
+CREATE_PLAIN_TABLES = '''
+CREATE TABLE shipment (
+    order_id varchar(255) NOT NULL,
+    status varchar(50) NOT NULL,
+    shipped_at timestamp without time zone NOT NULL DEFAULT now(),
+    id integer NOT NULL DEFAULT nextval('shipment_id_seq'),
+    CONSTRAINT shipment_pkey PRIMARY KEY (id),
+    CONSTRAINT shipment_order_id_key UNIQUE (order_id),
+    CONSTRAINT check_shipment_status
+        CHECK (status in ('PENDING', 'SHIPPED', 'CANCELLED'))
+);
+
+CREATE INDEX ix_shipment_shipped_at ON shipment (shipped_at);
+
+CREATE TABLE shipment_items (
+    shipment_id integer NOT NULL,
+    batch_id integer NOT NULL,
+    id integer NOT NULL DEFAULT nextval('shipment_items_id_seq'),
+    CONSTRAINT shipment_items_pkey PRIMARY KEY (id),
+    CONSTRAINT check_batche_shipment UNIQUE (shipment_id, batch_id),
+    CONSTRAINT shipment_items_shipment_id_fkey
+        FOREIGN KEY (shipment_id) REFERENCES shipment (id) ON DELETE CASCADE,
+    CONSTRAINT shipment_items_batch_id_fkey
+        FOREIGN KEY (batch_id)
+        REFERENCES production_batches (id) ON DELETE CASCADE
+);
+
+CREATE INDEX ix_shipment_items_shipment_id ON shipment_items (shipment_id);
+
+ALTER SEQUENCE shipment_id_seq OWNED BY shipment.id;
+ALTER SEQUENCE shipment_items_id_seq OWNED BY shipment_items.id;
+'''
+
+RENAME_TO_LEGACY = '''
+ALTER TABLE shipment_items RENAME TO shipment_items_legacy;
+ALTER TABLE shipment RENAME TO shipment_legacy;
+ALTER TABLE shipment_legacy
+    RENAME CONSTRAINT shipment_pkey TO shipment_legacy_pkey;
+ALTER TABLE shipment_legacy
+    RENAME CONSTRAINT shipment_order_id_key TO shipment_legacy_order_id_key;
+ALTER INDEX ix_shipment_shipped_at RENAME TO ix_shipment_legacy_shipped_at;
+ALTER TABLE shipment_items_legacy
+    RENAME CONSTRAINT shipment_items_pkey TO shipment_items_legacy_pkey;
+ALTER TABLE shipment_items_legacy
+    RENAME CONSTRAINT check_batche_shipment TO check_batche_shipment_legacy;
+ALTER INDEX ix_shipment_items_shipment_id
+    RENAME TO ix_shipment_items_legacy_shipment_id;
+'''
+
+RENAME_PARTITIONED_TO_LEGACY = '''
+ALTER TABLE shipment_items RENAME TO shipment_items_legacy;
+ALTER TABLE shipment RENAME TO shipment_legacy;
+ALTER INDEX shipment_pkey RENAME TO shipment_legacy_pkey;
+ALTER INDEX ix_shipment_shipped_at RENAME TO ix_shipment_legacy_shipped_at;
+ALTER INDEX shipment_items_pkey RENAME TO shipment_items_legacy_pkey;
+ALTER INDEX check_batche_shipment RENAME TO check_batche_shipment_legacy;
+ALTER INDEX ix_shipment_items_shipment_id
+    RENAME TO ix_shipment_items_legacy_shipment_id;
+'''
+
+# Позиция отгрузки теперь сама знает дату отгрузки, поиск по всем
+# секциям shipment не нужен.
+MARK_SHIPMENT_ITEM_DIRTY_PARTITIONED = '''
+CREATE OR REPLACE FUNCTION mark_shipment_item_dirty() RETURNS trigger AS $$
+DECLARE
+    item shipment_items%ROWTYPE;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        item := OLD;
+    ELSE
+        item := NEW;
+    END IF;
+    INSERT INTO analytics_dirty_buckets (product_id, day)
+    SELECT pb.product_id, item.shipped_at::date
+    FROM production_batches pb
+    WHERE pb.id = item.batch_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+MARK_SHIPMENT_ITEM_DIRTY_PLAIN = '''
+CREATE OR REPLACE FUNCTION mark_shipment_item_dirty() RETURNS trigger AS $$
+DECLARE
+    item shipment_items%ROWTYPE;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        item := OLD;
+    ELSE
+        item := NEW;
+    END IF;
+    INSERT INTO analytics_dirty_buckets (product_id, day)
+    SELECT pb.product_id, s.shipped_at::date
+    FROM shipment s
+    JOIN production_batches pb ON pb.id = item.batch_id
+    WHERE s.id = item.shipment_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+MARK_DIRTY_TRIGGERS = '''
+CREATE TRIGGER shipment_items_mark_dirty
+AFTER INSERT OR DELETE OR UPDATE OF shipment_id, batch_id
+ON shipment_items FOR EACH ROW EXECUTE FUNCTION mark_shipment_item_dirty();
+
+CREATE TRIGGER shipment_mark_dirty
+AFTER UPDATE OF status, shipped_at
+ON shipment FOR EACH ROW EXECUTE FUNCTION mark_shipment_dirty();
+
+CREATE TRIGGER shipment_mark_dirty_on_delete
+BEFORE DELETE
+ON shipment FOR EACH ROW EXECUTE FUNCTION mark_shipment_dirty();
+'''
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    month_index = month.year * 12 + month.month - 1 + months
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def create_monthly_partitions() -> None:
+    """Создает секции от самой старой отгрузки до MONTHS_AHEAD вперед."""
+    oldest = op.get_bind().execute(
+        sa.text('SELECT min(shipped_at) FROM shipment_legacy')).scalar()
+    current_month = datetime.date.today().replace(day=1)
+    month = (oldest.date().replace(day=1) if oldest is not None
+             else current_month)
+    while month <= add_months(current_month, MONTHS_AHEAD):
+        next_month = add_months(month, 1)
+        suffix = f'y{month.year}m{month.month:02d}'
+        for table in ('shipment', 'shipment_items'):
+            op.execute(
+                f"CREATE TABLE {table}_{suffix} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month}') TO ('{next_month}')")
+        month = next_month
+
+
+def upgrade() -> None:
+    op.execute(RENAME_TO_LEGACY)
+    op.execute(CREATE_PARTITIONED_TABLES)
+    create_monthly_partitions()
+    op.execute('''
+        INSERT INTO shipment (order_id, status, shipped_at, id)
+        SELECT order_id, status, shipped_at, id FROM shipment_legacy
+    ''')
+    op.execute('''
+        INSERT INTO shipment_items (shipment_id, batch_id, id, shipped_at)
+        SELECT si.shipment_id, si.batch_id, si.id, s.shipped_at
+        FROM shipment_items_legacy si
+        JOIN shipment_legacy s ON s.id = si.shipment_id
+    ''')
+    op.execute('DROP TABLE shipment_items_legacy')
+    op.execute('DROP TABLE shipment_legacy')
+    op.execute(MARK_SHIPMENT_ITEM_DIRTY_PARTITIONED)
+    op.execute(MARK_DIRTY_TRIGGERS)
+
+
+def downgrade() -> None:
+    op.execute(RENAME_PARTITIONED_TO_LEGACY)
+    op.execute(CREATE_PLAIN_TABLES)
+    op.execute('''
+        INSERT INTO shipment (order_id, status, shipped_at, id)
+        SELECT order_id, status, shipped_at, id FROM shipment_legacy
+    ''')
+    op.execute('''
+        INSERT INTO shipment_items (shipment_id, batch_id, id)
+        SELECT shipment_id, batch_id, id FROM shipment_items_legacy
+    ''')
+    op.execute('DROP TABLE shipment_items_legacy CASCADE')
+    op.execute('DROP TABLE shipment_legacy CASCADE')
+    op.execute('DROP FUNCTION IF EXISTS reserve_shipment_order_id()')
+    op.execute('DROP TABLE shipment_order_ids')
+    op.execute(MARK_SHIPMENT_ITEM_DIRTY_PLAIN)
+    op.execute(MARK_DIRTY_TRIGGERS)
@@ -0,0 +1,199 @@
+"""Inventory event feed
+
+Revision ID: a6b8d9c0a59b
+Revises: 8608b43216de
+Create Date: 2026-10-19 14:05:52.884310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6b8d9c0a59b'
+down_revision: Union[str, None] = '8608b43216de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+EVENT_IDS_REPORTED_MAX = 100
+
+# NOTIFY доставляется слушателям только после фиксации транзакции,
+# поэтому лента видит лишь закоммиченные изменения.
+EVENT_FUNCTIONS = '''
+CREATE OR REPLACE FUNCTION publish_inventory_event(
+    p_event_type text, p_product_id integer, p_storage_location text,
+    p_payload jsonb) RETURNS void AS $$
+DECLARE
+    new_event inventory_events%%ROWTYPE;
+BEGIN
+    INSERT INTO inventory_events (event_type, product_id, storage_location,
+                                  payload)
+    VALUES (p_event_type, p_product_id, p_storage_location, p_payload)
+    RETURNING * INTO new_event;
+    PERFORM pg_notify('inventory_events', json_build_object(
+        'id', new_event.id,
+        'type', new_event.event_type,
+        'product_id', new_event.product_id,
+        'storage_location', new_event.storage_location,
+        'created_at', new_event.created_at,
+        'data', new_event.payload)::text);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггер уровня оператора: одно сводное событие на оператор и пару
+-- (продукт, место хранения), а не на каждую строку. Иначе отгрузка на
+-- 100 тысяч партий разослала бы 100 тысяч уведомлений и переполнила
+-- очереди всех подписчиков. Списки ID в событии обрезаются, чтобы
+-- уложиться в лимит размера NOTIFY.
+CREATE OR REPLACE FUNCTION notify_inventory_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM publish_inventory_event(
+            'inventory', changed.product_id, changed.storage_location,
+            jsonb_build_object(
+                'op', TG_OP,
+                'rows', count(*),
+                'inventory_ids',
+                (array_agg(changed.id ORDER BY changed.id))[1:%(ids_max)s],
+                'batch_ids',
+                (array_agg(changed.batch_id
+                           ORDER BY changed.id))[1:%(ids_max)s],
+                'stock_quantity', sum(changed.stock_quantity),
+                'stock_delta', sum(changed.stock_quantity
+                                   - previous.stock_quantity),
+                'in_shipment', count(*) FILTER (WHERE changed.in_shipment)))
+        FROM changed_rows changed
+        JOIN previous_rows previous ON previous.id = changed.id
+        WHERE (previous.*) IS DISTINCT FROM (changed.*)
+        GROUP BY changed.product_id, changed.storage_location;
+    ELSE
+        PERFORM publish_inventory_event(
+            'inventory', changed.product_id, changed.storage_location,
+            jsonb_build_object(
+                'op', TG_OP,
+                'rows', count(*),
+                'inventory_ids',
+                (array_agg(changed.id ORDER BY changed.id))[1:%(ids_max)s],
+                'batch_ids',
+                (array_agg(changed.batch_id
+                           ORDER BY changed.id))[1:%(ids_max)s],
+                'stock_quantity', CASE WHEN TG_OP = 'DELETE' THEN 0
+                                       ELSE sum(changed.stock_quantity) END,
+                'stock_delta', CASE WHEN TG_OP = 'DELETE'
+                                    THEN -sum(changed.stock_quantity)
+                                    ELSE sum(changed.stock_quantity) END,
+                'in_shipment', count(*) FILTER (WHERE changed.in_shipment)))
+        FROM changed_rows changed
+        GROUP BY changed.product_id, changed.storage_location;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_batch_stage_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM publish_inventory_event(
+        'batch_stage', NEW.product_id, NULL,
+        jsonb_build_object(
+            'batch_id', NEW.id,
+            'current_stage', NEW.current_stage,
+            'previous_stage', CASE WHEN TG_OP = 'UPDATE'
+                                   THEN OLD.current_stage END,
+            'quantity_in_batch', NEW.quantity_in_batch));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_shipment_status_change()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM publish_inventory_event(
+        'shipment_status', NULL, NULL,
+        jsonb_build_object(
+            'shipment_id', NEW.id,
+            'order_id', NEW.order_id,
+            'status', NEW.status,
+            'previous_status', CASE WHEN TG_OP = 'UPDATE'
+                                    THEN OLD.status END));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+'''
+
+EVENT_TRIGGERS = '''
+CREATE TRIGGER warehouse_inventory_notify_insert
+AFTER INSERT ON warehouse_inventory
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_inventory_change();
+
+CREATE TRIGGER warehouse_inventory_notify_delete
+AFTER DELETE ON warehouse_inventory
+REFERENCING OLD TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_inventory_change();
+
+CREATE TRIGGER warehouse_inventory_notify_update
+AFTER UPDATE ON warehouse_inventory
+REFERENCING OLD TABLE AS previous_rows NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_inventory_change();
+
+CREATE TRIGGER production_batches_notify
+AFTER INSERT ON production_batches
+FOR EACH ROW EXECUTE FUNCTION notify_batch_stage_change();
+
+CREATE TRIGGER production_batches_notify_stage
+AFTER UPDATE OF current_stage ON production_batches
+FOR EACH ROW WHEN (OLD.current_stage IS DISTINCT FROM NEW.current_stage)
+EXECUTE FUNCTION notify_batch_stage_change();
+
+CREATE TRIGGER shipment_notify
+AFTER INSERT ON shipment
+FOR EACH ROW EXECUTE FUNCTION notify_shipment_status_change();
+
+CREATE TRIGGER shipment_notify_status
+AFTER UPDATE OF status ON shipment
+FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+EXECUTE FUNCTION notify_shipment_status_change();
+'''
+
+
+def upgrade() -> None:
+    op.create_table('inventory_events',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('event_type', sa.String(length=50), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('storage_location', sa.String(length=50), nullable=True),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_inventory_events_created_at', 'inventory_events',
+                    ['created_at'], unique=False)
+    op.execute(EVENT_FUNCTIONS % {'ids_max': EVENT_IDS_REPORTED_MAX})
+    op.execute(EVENT_TRIGGERS)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER IF EXISTS shipment_notify_status ON shipment')
+    op.execute('DROP TRIGGER IF EXISTS shipment_notify ON shipment')
+    op.execute('DROP TRIGGER IF EXISTS production_batches_notify_stage '
+               'ON production_batches')
+    op.execute('DROP TRIGGER IF EXISTS production_batches_notify '
+               'ON production_batches')
+    op.execute('DROP TRIGGER IF EXISTS warehouse_inventory_notify_update '
+               'ON warehouse_inventory')
+    op.execute('DROP TRIGGER IF EXISTS warehouse_inventory_notify_delete '
+               'ON warehouse_inventory')
+    op.execute('DROP TRIGGER IF EXISTS warehouse_inventory_notify_insert '
+               'ON warehouse_inventory')
+    op.execute('DROP FUNCTION IF EXISTS notify_shipment_status_change()')
+    op.execute('DROP FUNCTION IF EXISTS notify_batch_stage_change()')
+    op.execute('DROP FUNCTION IF EXISTS notify_inventory_change()')
+    op.execute('DROP FUNCTION IF EXISTS '
+               'publish_inventory_event(text, integer, text, jsonb)')
+    op.drop_index('ix_inventory_events_created_at',
+                  table_name='inventory_events')
+    op.drop_table('inventory_events')
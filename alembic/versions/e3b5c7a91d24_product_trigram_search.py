@@ -0,0 +1,33 @@
+"""Product trigram search
+
+Revision ID: e3b5c7a91d24
+Revises: 2df9125c5963
+Create Date: 2026-10-19 17:48:09.216734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b5c7a91d24'
+down_revision: Union[str, None] = '2df9125c5963'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ('product_name', 'name_model', 'serial_number')
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in SEARCH_COLUMNS:
+        op.create_index(f'ix_products_{column}_trgm', 'products', [column],
+                        postgresql_using='gin',
+                        postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    # Расширение pg_trgm не удаляется: его могут использовать другие схемы.
+    for column in SEARCH_COLUMNS:
+        op.drop_index(f'ix_products_{column}_trgm', table_name='products')
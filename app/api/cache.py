@@ -0,0 +1,58 @@
+import json
+import os
+from typing import Any, Awaitable, Callable, Sequence
+
+import redis.asyncio as asyncredis
+from dotenv import load_dotenv
+
+from api.constants_api import CACHE_TIME
+
+load_dotenv()
+
+
+redis = asyncredis.from_url(os.getenv('REDIS_URL'),
+                            decode_responses=True)
+# Отдельный клиент для сжатых и бинарных представлений ответов.
+binary_redis = asyncredis.from_url(os.getenv('REDIS_URL'))
+
+
+async def invalidate_cache(*cache_keys: str):
+    """Удаляет ключи кеша вместе со всеми их вариантами ('<ключ>:*')."""
+    keys = list(cache_keys)
+    for cache_key in cache_keys:
+        keys.extend([key async for key in redis.scan_iter(
+            match=f'{cache_key}:*')])
+    if keys:
+        await redis.delete(*keys)
+
+
+async def get_many_cached(
+        cache_prefix: str,
+        identifiers: Sequence[int],
+        load_missing: Callable[[list[int]], Awaitable[dict[int, Any]]]
+) -> dict[int, Any]:
+    """
+    Достает записи '<cache_prefix>:<id>' одним MGET, промахи загружает
+    через load_missing одним запросом и дописывает в кеш пайплайном.
+    Возвращает найденные записи по ID; отсутствующих в БД в словаре нет.
+    """
+    unique_ids = list(dict.fromkeys(identifiers))
+    if not unique_ids:
+        return {}
+    cached = await redis.mget([f'{cache_prefix}:{identifier}'
+                               for identifier in unique_ids])
+    found = {identifier: json.loads(value)
+             for identifier, value in zip(unique_ids, cached)
+             if value is not None}
+    missing_ids = [identifier for identifier in unique_ids
+                   if identifier not in found]
+    if missing_ids:
+        loaded = await load_missing(missing_ids)
+        if loaded:
+            async with redis.pipeline(transaction=False) as pipe:
+                for identifier, payload in loaded.items():
+                    pipe.set(f'{cache_prefix}:{identifier}',
+                             json.dumps(payload), ex=CACHE_TIME)
+                await pipe.execute()
+        found.update(loaded)
+    return found
@@ -1,4 +1,29 @@
 PRODUCTION_BATCH_CREATION_ERROR = {'server_error': 'batch was not created!'}
 ERROR_STATUS_RECEIVE_BATCH = {'error': 'batch is not in "COMPLETED" stage yet!'}
 ERROR_BATCH_ID_RECEIVE_BATCH = {'error': 'batch has been already added!'}
+ERROR_IMPORT_CONTENT_TYPE = {
+    'error': 'expected text/csv or application/x-ndjson body!'}
+ERROR_ANALYTICS_DATE_RANGE = {
+    'error': '"date_from" must not be later than "date_to"!'}
+ERROR_ANALYTICS_RANGE_TOO_WIDE = {'error': 'date range is too wide!'}
+ERROR_INSUFFICIENT_STOCK = (
+    'not enough available stock for one or more products!')
 CACHE_TIME = 3600
+COMPRESSION_MIN_SIZE = 1024
+GZIP_COMPRESS_LEVEL = 6
+BROTLI_QUALITY = 5
+MEDIA_TYPE_JSON = 'application/json'
+MEDIA_TYPE_MSGPACK = 'application/msgpack'
+MEDIA_TYPE_COLUMNAR = 'application/vnd.etalon.columnar+json'
+ERROR_UNKNOWN_EVENT_TYPE = {'error': 'unknown event type!'}
+ERROR_LAST_EVENT_ID = {'error': '"Last-Event-ID" must be an integer!'}
+SSE_RETRY_MILLISECONDS = 3000
+ERROR_ADMIN_FORBIDDEN = {'error': 'admin token is missing or invalid!'}
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+FIELDS_DESCRIPTION = 'Поля ответа через запятую, например id,name'
+IDS_DESCRIPTION = 'ID объектов, например ?ids=1&ids=2'
+SEARCH_QUERY_DESCRIPTION = 'Часть названия, модели или серийного номера'
+ERROR_SEARCH_CURSOR = {'error': 'search cursor is invalid!'}
+ERROR_SEARCH_QUERY_TOO_SHORT = {'error': 'search query is too short!'}
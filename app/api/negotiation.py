@@ -0,0 +1,153 @@
+import gzip
+import json
+from typing import Any, Awaitable, Callable, Optional
+
+import brotli
+import msgpack
+from fastapi import Request
+from fastapi.responses import Response
+
+from api.cache import binary_redis
+from api.constants_api import (CACHE_TIME, COMPRESSION_MIN_SIZE,
+                               GZIP_COMPRESS_LEVEL, BROTLI_QUALITY,
+                               MEDIA_TYPE_JSON, MEDIA_TYPE_MSGPACK,
+                               MEDIA_TYPE_COLUMNAR)
+
+RESPONSE_FORMATS = {
+    MEDIA_TYPE_JSON: 'json',
+    'application/*': 'json',
+    '*/*': 'json',
+    MEDIA_TYPE_MSGPACK: 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack',
+    MEDIA_TYPE_COLUMNAR: 'columnar',
+}
+FORMAT_MEDIA_TYPES = {
+    'json': MEDIA_TYPE_JSON,
+    'msgpack': MEDIA_TYPE_MSGPACK,
+    'columnar': MEDIA_TYPE_COLUMNAR,
+}
+ENCODINGS_PREFERENCE = ('br', 'gzip')
+VARY_HEADER = 'Accept, Accept-Encoding'
+
+
+def parse_quality_list(header: Optional[str]) -> list[tuple[str, float]]:
+    """Разбирает заголовок вида 'a;q=0.5, b' в список (значение, q)."""
+    parsed = []
+    for position, item in enumerate((header or '').split(',')):
+        value, *params = [part.strip() for part in item.split(';')]
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, raw_quality = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(raw_quality)
+                except ValueError:
+                    quality = 0.0
+        parsed.append((value.lower(), quality, position))
+    parsed.sort(key=lambda entry: (-entry[1], entry[2]))
+    return [(value, quality) for value, quality, _ in parsed]
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Выбирает формат ответа по заголовку Accept, по умолчанию JSON."""
+    for media_type, quality in parse_quality_list(accept):
+        if quality > 0 and media_type in RESPONSE_FORMATS:
+            return RESPONSE_FORMATS[media_type]
+    return 'json'
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Выбирает сжатие по заголовку Accept-Encoding (br, затем gzip)."""
+    accepted = {encoding: quality for encoding, quality
+                in parse_quality_list(accept_encoding)}
+    for encoding in ENCODINGS_PREFERENCE:
+        quality = accepted.get(encoding, accepted.get('*', 0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def to_columnar(payload: Any) -> Any:
+    """
+    Переводит список однотипных словарей в колонки: имена полей
+    передаются один раз, значения - массивами.
+    """
+    if isinstance(payload, dict):
+        return {key: to_columnar(value) for key, value in payload.items()}
+    if isinstance(payload, list) and all(
+            isinstance(row, dict) for row in payload):
+        columns = list(payload[0]) if payload else []
+        return {column: [row.get(column) for row in payload]
+                for column in columns}
+    return payload
+
+
+def encode_payload(payload: Any, response_format: str) -> bytes:
+    if response_format == 'msgpack':
+        return msgpack.packb(payload, use_bin_type=True)
+    if response_format == 'columnar':
+        payload = to_columnar(payload)
+    return json.dumps(payload, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_COMPRESS_LEVEL)
+
+
+def build_response(body: bytes, response_format: str,
+                   encoding: Optional[str], status_code: int) -> Response:
+    headers = {'Vary': VARY_HEADER}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(content=body, status_code=status_code, headers=headers,
+                    media_type=FORMAT_MEDIA_TYPES[response_format])
+
+
+async def negotiated_response(
+        request: Request,
+        cache_key: str,
+        load_payload: Callable[[], Awaitable[Any]],
+        status_code: int = 200) -> Response:
+    """
+    Отдает payload в формате и со сжатием, которые запросил клиент.
+    Закодированные и сжатые варианты кешируются рядом с исходным ключом
+    ('<ключ>:<формат>:<сжатие>'), чтобы не пережимать их на каждый запрос.
+    """
+    response_format = negotiate_format(request.headers.get('accept'))
+    encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+    variant_key = f'{cache_key}:{response_format}:{encoding or "identity"}'
+    cacheable = response_format != 'json' or encoding is not None
+
+    if cacheable:
+        cached_variant = await binary_redis.hgetall(variant_key)
+        if cached_variant:
+            cached_encoding = cached_variant[b'encoding'].decode() or None
+            return build_response(cached_variant[b'body'], response_format,
+                                  cached_encoding, status_code)
+
+    body = encode_payload(await load_payload(), response_format)
+    if encoding and len(body) >= COMPRESSION_MIN_SIZE:
+        body = compress_body(body, encoding)
+    else:
+        encoding = None
+
+    if cacheable:
+        # Вариант живет не дольше исходного ключа: иначе вариант, собранный
+        # из почти истекшей записи, продлил бы ее данные на целый CACHE_TIME.
+        # Если исходный ключ уже сброшен, вариант не кешируем вовсе.
+        ttl_ms = await binary_redis.pttl(cache_key)
+        if ttl_ms == -1:
+            ttl_ms = CACHE_TIME * 1000
+        if ttl_ms > 0:
+            async with binary_redis.pipeline(transaction=False) as pipe:
+                pipe.hset(variant_key, mapping={'encoding': encoding or '',
+                                                'body': body})
+                pipe.pexpire(variant_key, ttl_ms)
+                await pipe.execute()
+    return build_response(body, response_format, encoding, status_code)
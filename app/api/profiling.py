@@ -0,0 +1,86 @@
+import datetime
+import os
+import random
+import re
+import secrets
+import uuid
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import Header, Request
+from fastapi.exceptions import HTTPException
+from starlette import status
+
+from core.constants import PROFILE_DIR
+from core.profiling import StackSampler
+from api.constants_api import (PROFILE_HEADER, PROFILE_ID_HEADER,
+                               ADMIN_TOKEN_HEADER, ERROR_ADMIN_FORBIDDEN)
+
+load_dotenv()
+
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN')
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILES_PATH = os.getenv('PROFILE_DIR', PROFILE_DIR)
+
+
+def token_matches(expected: Optional[str], provided: Optional[str]) -> bool:
+    return bool(expected and provided
+                and secrets.compare_digest(expected, provided))
+
+
+def should_profile(request: Request) -> bool:
+    """Профилируем по привилегированному заголовку или по доле запросов."""
+    if token_matches(PROFILING_TOKEN, request.headers.get(PROFILE_HEADER)):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def profile_name(request: Request) -> str:
+    timestamp = datetime.datetime.now(datetime.UTC).strftime('%Y%m%dT%H%M%S')
+    path = re.sub(r'[^A-Za-z0-9]+', '_', request.url.path).strip('_')
+    return (f'{timestamp}-{request.method.lower()}-{path}-'
+            f'{uuid.uuid4().hex[:8]}.folded')
+
+
+async def profile_request(request: Request, call_next):
+    """
+    Выполняет запрос под семплирующим профилировщиком и сохраняет
+    стеки в PROFILE_DIR. Семплируется весь поток цикла событий, так что
+    в профиль попадают и параллельные запросы.
+    """
+    if not should_profile(request):
+        return await call_next(request)
+    sampler = StackSampler()
+    sampler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        sampler.stop()
+    name = profile_name(request)
+    os.makedirs(PROFILES_PATH, exist_ok=True)
+    with open(os.path.join(PROFILES_PATH, name), 'w') as profile:
+        profile.write(sampler.to_folded())
+    response.headers[PROFILE_ID_HEADER] = name
+    return response
+
+
+def list_profiles() -> list[str]:
+    if not os.path.isdir(PROFILES_PATH):
+        return []
+    return sorted((name for name in os.listdir(PROFILES_PATH)
+                   if name.endswith('.folded')), reverse=True)
+
+
+def profile_path(name: str) -> Optional[str]:
+    if name not in list_profiles():
+        return None
+    return os.path.join(PROFILES_PATH, name)
+
+
+async def require_admin_token(
+        x_admin_token: Optional[str] = Header(
+            default=None, alias=ADMIN_TOKEN_HEADER)):
+    if not token_matches(ADMIN_TOKEN, x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail=ERROR_ADMIN_FORBIDDEN)
@@ -1,40 +1,66 @@
+import asyncio
+import datetime
 import json
-import os
 from typing import List, Type, Optional
 
-import redis.asyncio as asyncredis
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
-from fastapi import Depends, status
-from fastapi.responses import JSONResponse
+from sqlalchemy import select, update, insert
+from fastapi import Depends, Header, Query, Request, status
+from fastapi.responses import (JSONResponse, StreamingResponse,
+                               FileResponse)
 from fastapi.exceptions import HTTPException
-from dotenv import load_dotenv
 
 from core.models.models import (Product, ProductionBatches,
                                 WarehouseInventory, Shipment,
-                                ShipmentItems)
+                                ShipmentItems, ShipmentOrderId)
 from core.schemas.schemas import (ProductGet, ShipmentPost,
                                   ProductionBatchesPost,
                                   ProductionBatchesPatchStatus,
                                   WarehouseInventoryPut,
                                   ReceiveBatchInWarehouseGet, HealthCheck,
-                                  WarehouseInventoryGet, ShipmentEntity)
-from core.models.db import get_db
+                                  WarehouseInventoryGet, ShipmentEntity,
+                                  ProductDailyStatsGet,
+                                  ShipmentAllocationPost, ProductSearchGet,
+                                  ProductSearchPage)
+from core.models.db import get_db, sessionmanager
 from .endpoints import (production_batches, products,
-                        warehouse, healthcheck)
+                        warehouse, analytics, admin, healthcheck)
 from core.models.crud import (get_or_404, ModelType,
                               joined_production_batch_with_product,
                               generate_unique_order_id,
-                              filter_batch_ids)
+                              lock_shippable_batches, batch_ids_param,
+                              parse_fields, fields_cache_key, select_fields,
+                              PRODUCT_FIELD_COLUMNS, INVENTORY_FIELD_COLUMNS,
+                              ids_param, check_multi_get_ids,
+                              not_found_marker)
+from core.models.ingest import import_products, detect_import_format
+from core.models.analytics import get_daily_stats
+from core.models.allocation import allocate_fifo, apply_allocations
+from core.models.group_commit import stage_update_batcher
+from core.models.search import search_products, decode_cursor
+from core.events import (broker, EventFilter, get_events_after,
+                         get_resume_point)
+from core.profiling import slow_query_log
+from core.constants import (ANALYTICS_MAX_RANGE_DAYS, EVENT_TYPES,
+                            EVENTS_REPLAY_PAGE_SIZE, EVENTS_HEARTBEAT_SECONDS,
+                            EVENTS_RESUME_MARGIN_SECONDS,
+                            SEARCH_MIN_QUERY_LENGTH, SEARCH_MAX_QUERY_LENGTH,
+                            SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT)
 from api.constants_api import (PRODUCTION_BATCH_CREATION_ERROR,
                                ERROR_STATUS_RECEIVE_BATCH,
-                               ERROR_BATCH_ID_RECEIVE_BATCH, CACHE_TIME)
-
-load_dotenv()
-
-
-redis = asyncredis.from_url(os.getenv('REDIS_URL'),
-                            decode_responses=True)
+                               ERROR_BATCH_ID_RECEIVE_BATCH, CACHE_TIME,
+                               ERROR_IMPORT_CONTENT_TYPE,
+                               ERROR_ANALYTICS_DATE_RANGE,
+                               ERROR_ANALYTICS_RANGE_TOO_WIDE,
+                               ERROR_UNKNOWN_EVENT_TYPE, ERROR_LAST_EVENT_ID,
+                               SSE_RETRY_MILLISECONDS,
+                               ERROR_INSUFFICIENT_STOCK, FIELDS_DESCRIPTION,
+                               IDS_DESCRIPTION, SEARCH_QUERY_DESCRIPTION,
+                               ERROR_SEARCH_CURSOR,
+                               ERROR_SEARCH_QUERY_TOO_SHORT)
+from api.cache import redis, invalidate_cache, get_many_cached
+from api.negotiation import negotiated_response
+from api.profiling import require_admin_token, list_profiles, profile_path
 
 
 def structure_response_for_batch(batch: Type[ModelType],
@@ -52,31 +78,135 @@ def structure_response_for_batch(batch: Type[ModelType],
     return response_batch_content
 
 
-@products.get('/', response_model=List[ProductGet],
-              status_code=status.HTTP_200_OK)
-async def get_products(db: AsyncSession = Depends(get_db)):
-    """Возвращает список всех продуктов."""
-    cache_key = 'all_products'
-    cached_data = await redis.get(cache_key)
-
-    if cached_data:
-        return json.loads(cached_data)
-    result = await db.execute(select(Product))
-    all_products = result.scalars().all()
+def format_server_sent_event(event: dict) -> str:
+    """Оформляет событие ленты в формате text/event-stream."""
+    return (f'id: {event["id"]}\nevent: {event["type"]}\n'
+            f'data: {json.dumps(event, ensure_ascii=False)}\n\n')
 
-    serialized_data = [ProductGet.from_orm(product).model_dump()
-                       for product in all_products]
-    await redis.set(cache_key, json.dumps(serialized_data), ex=CACHE_TIME)
 
-    return all_products
+@products.get('/', response_model=List[ProductGet],
+              status_code=status.HTTP_200_OK)
+async def get_products(request: Request,
+                       fields: Optional[str] = Query(
+                           default=None, description=FIELDS_DESCRIPTION),
+                       ids: Optional[List[int]] = Query(
+                           default=None, description=IDS_DESCRIPTION),
+                       db: AsyncSession = Depends(get_db)):
+    """
+    Возвращает список всех продуктов, а с ids - только запрошенные
+    в порядке запроса.
+    """
+    field_names = parse_fields(fields, PRODUCT_FIELD_COLUMNS)
+    if ids is not None:
+        return await get_products_by_ids(db=db, product_ids=ids,
+                                         field_names=field_names)
+    cache_key = fields_cache_key('all_products', field_names,
+                                 PRODUCT_FIELD_COLUMNS)
+
+    async def load_products():
+        cached_data = await redis.get(cache_key)
+        if cached_data:
+            return json.loads(cached_data)
+        serialized_data = await select_fields(
+            db, ProductGet, PRODUCT_FIELD_COLUMNS, field_names)
+        await redis.set(cache_key, json.dumps(serialized_data),
+                        ex=CACHE_TIME)
+        return serialized_data
+
+    return await negotiated_response(request=request, cache_key=cache_key,
+                                     load_payload=load_products)
+
+
+@products.get('/search', response_model=ProductSearchPage,
+              status_code=status.HTTP_200_OK)
+async def search_products_catalogue(
+        q: str = Query(min_length=SEARCH_MIN_QUERY_LENGTH,
+                       max_length=SEARCH_MAX_QUERY_LENGTH,
+                       description=SEARCH_QUERY_DESCRIPTION),
+        limit: int = Query(default=SEARCH_DEFAULT_LIMIT, ge=1,
+                           le=SEARCH_MAX_LIMIT),
+        cursor: Optional[str] = Query(default=None),
+        db: AsyncSession = Depends(get_db)):
+    """
+    Ищет продукты по части названия, модели или серийного номера,
+    самые похожие - первыми. Длина запроса проверяется без крайних
+    пробелов: пустой шаблон совпал бы с каждым продуктом.
+    """
+    query = q.strip()
+    if len(query) < SEARCH_MIN_QUERY_LENGTH:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=ERROR_SEARCH_QUERY_TOO_SHORT)
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=ERROR_SEARCH_CURSOR)
+    found, next_cursor = await search_products(
+        db=db, query=query, limit=limit, after=after)
+    return ProductSearchPage(
+        products=[ProductSearchGet.model_validate(product)
+                  for product in found],
+        next_cursor=next_cursor)
+
+
+async def get_products_by_ids(db: AsyncSession, product_ids: List[int],
+                              field_names: tuple[str, ...]) -> JSONResponse:
+    """Мульти-запрос продуктов через кеш 'product:<id>'."""
+    check_multi_get_ids(product_ids)
+
+    async def load_missing(missing_ids: list[int]) -> dict[int, dict]:
+        loaded = await select_fields(
+            db, ProductGet, PRODUCT_FIELD_COLUMNS,
+            tuple(PRODUCT_FIELD_COLUMNS), Product.id == ids_param(missing_ids))
+        return {product['id']: product for product in loaded}
+
+    found = await get_many_cached('product', product_ids, load_missing)
+    results = [
+        {name: found[product_id][name] for name in field_names}
+        if product_id in found else not_found_marker(Product, product_id)
+        for product_id in product_ids
+    ]
+    return JSONResponse(content={'products': results})
 
 
 @products.get('/{product_id}', response_model=ProductGet,
               status_code=status.HTTP_200_OK)
-async def get_product(product_id: int, db: AsyncSession = Depends(get_db)):
+async def get_product(product_id: int,
+                      fields: Optional[str] = Query(
+                          default=None, description=FIELDS_DESCRIPTION),
+                      db: AsyncSession = Depends(get_db)):
     """Возвращает информацию о продукте по его ID."""
-    return await get_or_404(db=db, model=Product,
-                            identifier=product_id)
+    field_names = parse_fields(fields, PRODUCT_FIELD_COLUMNS)
+    cache_key = fields_cache_key(f'product:{product_id}', field_names,
+                                 PRODUCT_FIELD_COLUMNS)
+    cached_data = await redis.get(cache_key)
+    if cached_data:
+        return JSONResponse(content=json.loads(cached_data))
+    found = await select_fields(db, ProductGet, PRODUCT_FIELD_COLUMNS,
+                                field_names, Product.id == product_id)
+    if not found:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f'Product with ID {product_id} is not found')
+    await redis.set(cache_key, json.dumps(found[0]), ex=CACHE_TIME)
+    return JSONResponse(content=found[0])
+
+
+@products.post('/import', response_class=JSONResponse,
+               status_code=status.HTTP_200_OK)
+async def import_products_catalogue(
+        request: Request, db: AsyncSession = Depends(get_db)):
+    """Загружает или обновляет каталог продуктов из потока CSV/NDJSON."""
+    import_format = detect_import_format(request.headers.get('content-type'))
+    if import_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=ERROR_IMPORT_CONTENT_TYPE)
+    report = await import_products(db=db, chunks=request.stream(),
+                                   import_format=import_format)
+    await db.commit()
+    await invalidate_cache('all_products', 'product')
+    return JSONResponse(content=report, status_code=status.HTTP_200_OK)
 
 
 @production_batches.post('/', response_class=JSONResponse)
@@ -108,6 +238,26 @@ async def post_production_batch(
                         detail=PRODUCTION_BATCH_CREATION_ERROR)
 
 
+@production_batches.get('/', response_class=JSONResponse)
+async def get_production_batches(
+        ids: List[int] = Query(description=IDS_DESCRIPTION),
+        db: AsyncSession = Depends(get_db)):
+    """Возвращает производственные партии по списку ID в порядке запроса."""
+    check_multi_get_ids(ids)
+
+    async def load_missing(missing_ids: list[int]) -> dict[int, dict]:
+        result = await db.execute(select(ProductionBatches).where(
+            ProductionBatches.id == ids_param(missing_ids)))
+        return {batch.id: structure_response_for_batch(batch=batch)
+                for batch in result.scalars()}
+
+    found = await get_many_cached('production_batch', ids, load_missing)
+    results = [found.get(batch_id)
+               or not_found_marker(ProductionBatches, batch_id)
+               for batch_id in ids]
+    return JSONResponse(content={'production_batches': results})
+
+
 @production_batches.patch('/{batch_id}/stages', response_class=JSONResponse,
                           status_code=status.HTTP_200_OK)
 async def modify_production_batch_status(
@@ -115,12 +265,18 @@ async def modify_production_batch_status(
         batch_id: int, db: AsyncSession = Depends(get_db),
 ):
     """Изменяет статус производственной партии."""
-    current_batch = await get_or_404(
-        db=db, model=ProductionBatches, identifier=batch_id)
-    previous_stage = current_batch.current_stage
-    current_batch.current_stage = new_stage.new_stage
-    await db.commit()
-    await db.refresh(current_batch)
+    if stage_update_batcher.enabled:
+        current_batch = await stage_update_batcher.submit(
+            batch_id=batch_id, new_stage=new_stage.new_stage)
+        previous_stage = current_batch.previous_stage
+    else:
+        current_batch = await get_or_404(
+            db=db, model=ProductionBatches, identifier=batch_id)
+        previous_stage = current_batch.current_stage
+        current_batch.current_stage = new_stage.new_stage
+        await db.commit()
+        await db.refresh(current_batch)
+    await redis.delete(f'production_batch:{batch_id}')
     updated_batch = structure_response_for_batch(batch=current_batch)
     updated_batch.update({'previous_stage': previous_stage})
     response_content = {
@@ -156,6 +312,8 @@ async def receive_batch_in_warehouse(
     received_batch_in_warehouse = WarehouseInventory(
         product_id=batch.product_id, batch_id=batch_id,
         stock_quantity=new_inventory_batch.quantity_received,
+        quantity_received=new_inventory_batch.quantity_received,
+        batch_start_date=batch.start_date,
         **new_inventory_batch.model_dump(exclude={'quantity_received'}))
     db.add(received_batch_in_warehouse)
     await db.commit()
@@ -171,26 +329,29 @@ async def receive_batch_in_warehouse(
 
 
 @warehouse.get('/inventory', response_class=JSONResponse)
-async def get_all_inventory(db: AsyncSession = Depends(get_db)):
+async def get_all_inventory(request: Request,
+                            fields: Optional[str] = Query(
+                                default=None,
+                                description=FIELDS_DESCRIPTION),
+                            db: AsyncSession = Depends(get_db)):
     """Возвращает весь складской инвентарь."""
-    cache_key = 'warehouse_inventory'
-    cached_data = await redis.get(cache_key)
-
-    if cached_data:
-        return json.loads(cached_data)
+    field_names = parse_fields(fields, INVENTORY_FIELD_COLUMNS)
+    cache_key = fields_cache_key('warehouse_inventory', field_names,
+                                 INVENTORY_FIELD_COLUMNS)
 
-    query_models = await db.execute(
-        select(WarehouseInventory))
-    results = query_models.scalars().all()
+    async def load_inventory():
+        cached_data = await redis.get(cache_key)
+        if cached_data:
+            return json.loads(cached_data)
+        inventory = await select_fields(
+            db, WarehouseInventoryGet, INVENTORY_FIELD_COLUMNS, field_names)
+        inventory_dict = {'inventory': inventory}
+        await redis.set(cache_key, json.dumps(inventory_dict),
+                        ex=CACHE_TIME)
+        return inventory_dict
 
-    inventory = [
-        WarehouseInventoryGet.from_orm(row).model_dump(
-            exclude={'id'}) for row in results
-    ]
-    inventory_dict = {'inventory': inventory}
-    await redis.set(cache_key, json.dumps(inventory_dict), ex=CACHE_TIME)
-    return JSONResponse(content=inventory_dict,
-                        status_code=status.HTTP_200_OK)
+    return await negotiated_response(request=request, cache_key=cache_key,
+                                     load_payload=load_inventory)
 
 
 @warehouse.post('/shipments', response_class=JSONResponse,
@@ -198,40 +359,165 @@ async def get_all_inventory(db: AsyncSession = Depends(get_db)):
 async def post_order(
         new_shipment: ShipmentPost,
         db: AsyncSession = Depends(get_db)):
-    """Создает новый заказ и добавляет его в базу данных."""
-    order_id = await generate_unique_order_id(db=db, model=Shipment)
+    """
+    Создает новый заказ и добавляет его в базу данных. Партия уходит
+    в заказ целиком: вместе с частично распределенными партиями отгружается
+    весь их оставшийся на складе остаток.
+    """
+    order_id = await generate_unique_order_id(db=db, model=ShipmentOrderId)
     batch_ids = [order.batch_id for order in new_shipment.items]
-    batches_checked = await filter_batch_ids(
-        db=db, model=WarehouseInventory, batch_ids=batch_ids)
-    await filter_batch_ids(db=db, model=ShipmentItems, batch_ids=batch_ids,
-                           check_shipments=True)
+    stock = await lock_shippable_batches(db=db, batch_ids=batch_ids)
 
     await db.execute(update(WarehouseInventory).where(
-        WarehouseInventory.batch_id.in_(
-            [inventory.batch_id for inventory in batches_checked])).values(
-        in_shipment=True, stock_quantity=0
-    ))
+        WarehouseInventory.batch_id == batch_ids_param(batch_ids)
+    ).values(in_shipment=True, stock_quantity=0).execution_options(
+        synchronize_session=False))
 
     shipment = Shipment(order_id=order_id, status=new_shipment.status)
     db.add(shipment)
     await db.flush()
 
-    shipment_items = [ShipmentItems(
-        shipment_id=shipment.id, batch_id=batch_id) for batch_id in batch_ids]
-    db.add_all(shipment_items)
-
-    await db.flush()
+    if batch_ids:
+        await db.execute(insert(ShipmentItems), [
+            {'shipment_id': shipment.id, 'batch_id': batch_id,
+             'quantity': stock[batch_id]} for batch_id in batch_ids])
     await db.commit()
     await db.refresh(shipment)
+    await invalidate_cache('warehouse_inventory')
     response_data = {
         'shipment_id': shipment.id,
         'order_id': shipment.order_id,
-        'items': [{'batch_id': batch} for batch in batch_ids],
+        'items': [{'batch_id': batch, 'quantity': stock[batch]}
+                  for batch in batch_ids],
         'status': shipment.status
     }
     return response_data
 
 
+@warehouse.post('/shipments/allocate', response_class=JSONResponse,
+                status_code=status.HTTP_201_CREATED)
+async def post_allocated_order(
+        new_shipment: ShipmentAllocationPost,
+        db: AsyncSession = Depends(get_db)):
+    """
+    Создает заказ по количеству продукта: сервер сам подбирает партии
+    со склада в порядке FIFO.
+    """
+    order_id = await generate_unique_order_id(db=db, model=ShipmentOrderId)
+    allocations = []
+    shortages = []
+    for item in new_shipment.items:
+        picked = await allocate_fifo(
+            db=db, product_id=item.product_id, quantity=item.quantity,
+            preferred_location=new_shipment.storage_location)
+        available = sum(allocation.quantity for allocation in picked)
+        if available < item.quantity:
+            shortages.append({'product_id': item.product_id,
+                              'requested': item.quantity,
+                              'available': available})
+        allocations += picked
+    if shortages:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={'error': ERROR_INSUFFICIENT_STOCK,
+                    'products': shortages})
+
+    await apply_allocations(db=db, allocations=allocations)
+    shipment = Shipment(order_id=order_id, status=new_shipment.status)
+    db.add(shipment)
+    await db.flush()
+    await db.execute(insert(ShipmentItems), [
+        {'shipment_id': shipment.id, 'batch_id': allocation.batch_id,
+         'quantity': allocation.quantity} for allocation in allocations])
+    await db.commit()
+    await invalidate_cache('warehouse_inventory')
+
+    response_data = {
+        'shipment_id': shipment.id,
+        'order_id': order_id,
+        'items': [{'product_id': allocation.product_id,
+                   'batch_id': allocation.batch_id,
+                   'storage_location': allocation.storage_location,
+                   'quantity': allocation.quantity}
+                  for allocation in allocations],
+        'status': new_shipment.status
+    }
+    return JSONResponse(content=response_data,
+                        status_code=status.HTTP_201_CREATED)
+
+
+@warehouse.get('/events', response_class=StreamingResponse)
+async def stream_inventory_events(
+        product_id: Optional[List[int]] = Query(default=None),
+        storage_location: Optional[List[str]] = Query(default=None),
+        event_type: Optional[List[str]] = Query(default=None),
+        last_event_id: Optional[str] = Query(default=None),
+        last_event_id_header: Optional[str] = Header(
+            default=None, alias='Last-Event-ID')):
+    """
+    Лента изменений остатков, стадий партий и статусов отгрузок (SSE).
+    После переподключения дочитывает события после Last-Event-ID.
+    """
+    if event_type and not set(event_type) <= set(EVENT_TYPES):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=ERROR_UNKNOWN_EVENT_TYPE)
+    resume_from = last_event_id_header or last_event_id
+    try:
+        resume_from = int(resume_from) if resume_from else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=ERROR_LAST_EVENT_ID)
+    event_filter = EventFilter(product_ids=product_id,
+                               storage_locations=storage_location,
+                               event_types=event_type)
+
+    async def events():
+        # Подписываемся до чтения журнала, чтобы не потерять события,
+        # зафиксированные между чтением и подпиской.
+        subscription = broker.subscribe(event_filter)
+        # ID из журнала не упорядочены по времени фиксации, поэтому живые
+        # события сверяются только с теми, что уже отданы при дочитывании.
+        replayed_ids = set()
+        try:
+            yield f'retry: {SSE_RETRY_MILLISECONDS}\n\n'
+            if resume_from is not None:
+                async with sessionmanager.session() as db:
+                    replay_after = await get_resume_point(
+                        db=db, last_event_id=resume_from,
+                        margin_seconds=EVENTS_RESUME_MARGIN_SECONDS)
+            while resume_from is not None:
+                async with sessionmanager.session() as db:
+                    replayed = await get_events_after(
+                        db=db, last_event_id=replay_after,
+                        event_filter=event_filter,
+                        limit=EVENTS_REPLAY_PAGE_SIZE)
+                for event in replayed:
+                    yield format_server_sent_event(event)
+                    replayed_ids.add(event['id'])
+                    replay_after = event['id']
+                if len(replayed) < EVENTS_REPLAY_PAGE_SIZE:
+                    break
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.get(), EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                if event is None:
+                    break
+                if event['id'] in replayed_ids:
+                    continue
+                yield format_server_sent_event(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache',
+                                      'X-Accel-Buffering': 'no'})
+
+
 @warehouse.patch('/change-status', response_class=JSONResponse)
 async def change_shipment_status(
         shipment_id: int, new_status_shipment: ShipmentEntity,
@@ -246,6 +532,58 @@ async def change_shipment_status(
                         status_code=status.HTTP_200_OK)
 
 
+@analytics.get('/daily', response_model=List[ProductDailyStatsGet],
+               status_code=status.HTTP_200_OK)
+async def get_daily_product_stats(
+        date_from: datetime.date,
+        date_to: datetime.date,
+        product_id: Optional[List[int]] = Query(default=None),
+        db: AsyncSession = Depends(get_db)):
+    """Возвращает дневную статистику производства и отгрузок."""
+    if date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=ERROR_ANALYTICS_DATE_RANGE)
+    if (date_to - date_from).days > ANALYTICS_MAX_RANGE_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=ERROR_ANALYTICS_RANGE_TOO_WIDE)
+    return await get_daily_stats(db=db, date_from=date_from,
+                                 date_to=date_to, product_ids=product_id)
+
+
+@admin.get('/slow-queries', response_class=JSONResponse,
+           dependencies=[Depends(require_admin_token)])
+async def get_slow_queries():
+    """Возвращает последние медленные запросы, новые первыми."""
+    return JSONResponse(content={
+        'threshold_ms': slow_query_log.threshold_ms,
+        'queries': slow_query_log.snapshot()})
+
+
+@admin.delete('/slow-queries', status_code=status.HTTP_204_NO_CONTENT,
+              dependencies=[Depends(require_admin_token)])
+async def clear_slow_queries():
+    """Очищает журнал медленных запросов."""
+    slow_query_log.clear()
+
+
+@admin.get('/profiles', response_class=JSONResponse,
+           dependencies=[Depends(require_admin_token)])
+async def get_profiles():
+    """Возвращает имена сохраненных профилей запросов."""
+    return JSONResponse(content={'profiles': list_profiles()})
+
+
+@admin.get('/profiles/{name}', response_class=FileResponse,
+           dependencies=[Depends(require_admin_token)])
+async def get_profile(name: str):
+    """Отдает профиль запроса в формате folded stacks."""
+    path = profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f'Profile {name} is not found')
+    return FileResponse(path, media_type='text/plain', filename=name)
+
+
 @healthcheck.get('/', tags=['healthcheck'],
                  status_code=status.HTTP_200_OK, response_model=HealthCheck,)
 async def get_health() -> HealthCheck:
@@ -18,6 +18,18 @@ warehouse = APIRouter(
     responses={404: {'description': 'Not found'}},
 )
 
+analytics = APIRouter(
+    prefix='/api/v1/analytics',
+    tags=['analytics'],
+    responses={404: {'description': 'Not found'}},
+)
+
+admin = APIRouter(
+    prefix='/api/v1/admin',
+    tags=['admin'],
+    responses={404: {'description': 'Not found'}},
+)
+
 healthcheck = APIRouter(
     prefix='/api/v1/healthcheck',
     tags=['healthcheck'],
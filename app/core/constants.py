@@ -9,7 +9,56 @@ PRODUCTION_BATCHES_DESCRIPTION_STATUS = ', '.join(PRODUCTION_BATCHES_STATUSES)
 PRODUCTS_STATUSES = ('IN_PRODUCTION', 'IN_STOCK', 'OUT_OF_STOCK')
 BATCH_DOES_NOT_EXIST = 'One or more batch IDs do not exist'
 BATCH_EXISTS_IN_SHIPMENTS = 'One or more batches have already been added in shipments'
+BATCH_IDS_REPORTED_MAX = 1000
+UNKNOWN_FIELDS = 'One or more requested fields do not exist'
+MULTI_GET_MAX_IDS = 1000
+MULTI_GET_IDS_ERROR = (
+    f'Between 1 and {MULTI_GET_MAX_IDS} IDs must be requested')
+SHIPMENT_MAX_ITEMS = 100_000
+ALLOCATION_FIRST_CHUNK = 2
+ALLOCATION_MAX_CHUNK = 64
+ALLOCATION_MAX_PRODUCTS = 1000
 PRODUCT_REGEX = '^(' + '|'.join(PRODUCTS_STATUSES) + ')$'
 PRODUCT_DESCRIPTION_STATUS = ', '.join(PRODUCTS_STATUSES)
 
+IMPORT_FORMATS = {'text/csv': 'csv', 'application/x-ndjson': 'ndjson',
+                  'application/ndjson': 'ndjson',
+                  'application/jsonl': 'ndjson'}
+IMPORT_CHUNK_SIZE = 10_000
+IMPORT_READ_SIZE = 1024 * 1024
+IMPORT_MAX_REJECTED_REPORTED = 100
+IMPORT_STAGING_TABLE = 'products_staging'
 
+ANALYTICS_REFRESH_LOCK_ID = 720_270_001
+ANALYTICS_REFRESH_SECONDS = 60
+ANALYTICS_MAX_RANGE_DAYS = 366 * 5
+
+PARTITIONED_SHIPMENT_TABLES = ('shipment', 'shipment_items')
+SHIPMENT_ITEMS_SHIPMENT_FKEY = 'shipment_items_shipment_id_fkey'
+PARTITION_MONTHS_AHEAD = 3
+PARTITION_MAINTENANCE_SECONDS = 6 * 3600
+PARTITION_MAINTENANCE_LOCK_ID = 720_270_002
+SHIPMENT_ARCHIVE_AFTER_MONTHS = 12
+
+EVENTS_CHANNEL = 'inventory_events'
+EVENT_TYPES = ('inventory', 'batch_stage', 'shipment_status')
+EVENTS_QUEUE_SIZE = 1000
+EVENTS_RECONNECT_SECONDS = 2
+EVENTS_REPLAY_PAGE_SIZE = 500
+EVENTS_RESUME_MARGIN_SECONDS = 5
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_RETENTION_DAYS = 7
+
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_DIR = 'profiles'
+SLOW_QUERY_THRESHOLD_MS = 200
+SLOW_QUERY_LOG_SIZE = 100
+SLOW_QUERY_STATEMENT_MAX_LENGTH = 10_000
+
+STAGE_GROUP_COMMIT_WINDOW_MS = 5
+STAGE_GROUP_COMMIT_MAX_BATCH = 100
+PRODUCT_SEARCH_COLUMNS = ('product_name', 'name_model', 'serial_number')
+SEARCH_MIN_QUERY_LENGTH = 3
+SEARCH_MAX_QUERY_LENGTH = 100
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
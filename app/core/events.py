@@ -0,0 +1,205 @@
+import asyncio
+import datetime
+import json
+import logging
+import os
+from typing import Any, Optional, Sequence
+
+import asyncpg
+from dotenv import load_dotenv
+from sqlalchemy import select, delete, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.constants import (EVENTS_CHANNEL, EVENTS_QUEUE_SIZE,
+                            EVENTS_RECONNECT_SECONDS)
+from core.models.models import InventoryEvent
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class EventFilter:
+    """Фильтр подписки: пустой набор значений пропускает все события."""
+
+    def __init__(self,
+                 product_ids: Optional[Sequence[int]] = None,
+                 storage_locations: Optional[Sequence[str]] = None,
+                 event_types: Optional[Sequence[str]] = None):
+        self.product_ids = set(product_ids or ())
+        self.storage_locations = set(storage_locations or ())
+        self.event_types = set(event_types or ())
+
+    def matches(self, event: dict) -> bool:
+        if self.event_types and event['type'] not in self.event_types:
+            return False
+        if (self.product_ids
+                and event['product_id'] not in self.product_ids):
+            return False
+        if (self.storage_locations
+                and event['storage_location'] not in self.storage_locations):
+            return False
+        return True
+
+
+class Subscription:
+    """Очередь событий одного клиента ленты."""
+
+    def __init__(self, event_filter: EventFilter):
+        self.event_filter = event_filter
+        self.queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        self.closed = False
+
+    def publish(self, event: Optional[dict]):
+        if self.closed:
+            return
+        if event is not None and not self.event_filter.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Медленный клиент: закрываем ленту, он переподключится
+            # с Last-Event-ID и дочитает пропущенное из журнала.
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self) -> Optional[dict]:
+        return await self.queue.get()
+
+
+class InventoryEventBroker:
+    """
+    Держит одно соединение LISTEN на процесс и раздает уведомления
+    подписчикам. Каждый воркер слушает канал сам, так что события
+    доходят до клиентов всех воркеров.
+    """
+
+    def __init__(self, database_url: Optional[str]):
+        self._dsn = (make_url(database_url).set(drivername='postgresql')
+                     .render_as_string(hide_password=False)
+                     if database_url else None)
+        self._subscriptions: set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._dsn is None or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscription in list(self._subscriptions):
+            subscription.close()
+
+    def subscribe(self, event_filter: EventFilter) -> Subscription:
+        subscription = Subscription(event_filter)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def _on_notification(self, _connection, _pid, _channel, payload: str):
+        event = json.loads(payload)
+        for subscription in list(self._subscriptions):
+            subscription.publish(event)
+
+    async def _listen_forever(self):
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self._dsn)
+                disconnected = asyncio.Event()
+                connection.add_termination_listener(
+                    lambda _connection: disconnected.set())
+                await connection.add_listener(
+                    EVENTS_CHANNEL, self._on_notification)
+                await disconnected.wait()
+            except asyncio.CancelledError:
+                if connection is not None:
+                    await connection.close()
+                raise
+            except Exception:
+                logger.exception('Inventory event listener failed')
+            # Уведомления, пришедшие без соединения, потеряны: закрываем
+            # ленты, клиенты переподключатся и дочитают их из журнала.
+            for subscription in list(self._subscriptions):
+                subscription.close()
+            await asyncio.sleep(EVENTS_RECONNECT_SECONDS)
+
+
+def serialize_event(event: InventoryEvent) -> dict[str, Any]:
+    return {
+        'id': event.id,
+        'type': event.event_type,
+        'product_id': event.product_id,
+        'storage_location': event.storage_location,
+        'created_at': event.created_at.isoformat(),
+        'data': event.payload,
+    }
+
+
+async def get_resume_point(db: AsyncSession, last_event_id: int,
+                           margin_seconds: float) -> int:
+    """
+    ID, после которого дочитывать журнал при переподключении. ID выдаются
+    при вставке, а фиксируются транзакции в другом порядке: событие с
+    меньшим ID может закоммититься позже того, что клиент уже получил.
+    Поэтому перечитываются и события, созданные за margin_seconds до
+    last_event_id; клиент отбрасывает повторы по id.
+    """
+    last_created_at = (
+        select(InventoryEvent.created_at)
+        .where(InventoryEvent.id == last_event_id).scalar_subquery())
+    result = await db.execute(
+        select(func.min(InventoryEvent.id)).where(
+            InventoryEvent.id <= last_event_id,
+            InventoryEvent.created_at >= last_created_at - datetime.timedelta(
+                seconds=margin_seconds)))
+    first_id = result.scalar()
+    return last_event_id if first_id is None else first_id - 1
+
+
+async def get_events_after(
+        db: AsyncSession, last_event_id: int,
+        event_filter: EventFilter, limit: int) -> list[dict]:
+    """Возвращает события журнала после last_event_id."""
+    query = select(InventoryEvent).where(InventoryEvent.id > last_event_id)
+    if event_filter.event_types:
+        query = query.where(
+            InventoryEvent.event_type.in_(event_filter.event_types))
+    if event_filter.product_ids:
+        query = query.where(
+            InventoryEvent.product_id.in_(event_filter.product_ids))
+    if event_filter.storage_locations:
+        query = query.where(InventoryEvent.storage_location.in_(
+            event_filter.storage_locations))
+    result = await db.execute(query.order_by(InventoryEvent.id).limit(limit))
+    return [serialize_event(event) for event in result.scalars()]
+
+
+async def prune_events(db: AsyncSession, older_than_days: int) -> int:
+    """Удаляет из журнала события старше older_than_days дней."""
+    cutoff = (datetime.datetime.now(datetime.UTC)
+              - datetime.timedelta(days=older_than_days))
+    result = await db.execute(delete(InventoryEvent).where(
+        InventoryEvent.created_at < cutoff))
+    await db.commit()
+    return result.rowcount
+
+
+broker = InventoryEventBroker(os.getenv('DATABASE_URL'))
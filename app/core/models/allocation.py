@@ -0,0 +1,118 @@
+import datetime
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.constants import ALLOCATION_FIRST_CHUNK, ALLOCATION_MAX_CHUNK
+from core.models.models import WarehouseInventory
+
+APPLY_ALLOCATIONS = '''
+    UPDATE warehouse_inventory wi
+    SET stock_quantity = wi.stock_quantity - picked.quantity,
+        in_shipment = (wi.stock_quantity - picked.quantity = 0)
+    FROM unnest(CAST(:inventory_ids AS integer[]),
+                CAST(:quantities AS integer[])) AS picked (id, quantity)
+    WHERE wi.id = picked.id
+'''
+
+
+@dataclass
+class Allocation:
+    inventory_id: int
+    batch_id: int
+    product_id: int
+    storage_location: str
+    quantity: int
+
+
+async def pick_available_batches(
+        db: AsyncSession,
+        product_id: int,
+        quantity: int,
+        storage_location: Optional[str] = None,
+        exclude_location: Optional[str] = None) -> list[Allocation]:
+    """
+    Идет по доступным партиям продукта в порядке FIFO (по дате запуска
+    партии) небольшими порциями по частичному индексу и блокирует их.
+    Партии, которые сейчас распределяет другой заказ, пропускаются
+    (SKIP LOCKED), так что стоимость пропорциональна числу выбранных
+    партий, а не размеру склада. Порции растут вдвое, чтобы не держать
+    лишних блокировок на партиях, которые заказу не понадобятся.
+    """
+    query = (
+        select(WarehouseInventory.id, WarehouseInventory.batch_id,
+               WarehouseInventory.storage_location,
+               WarehouseInventory.stock_quantity,
+               WarehouseInventory.batch_start_date)
+        .where(WarehouseInventory.product_id == product_id,
+               ~WarehouseInventory.in_shipment,
+               WarehouseInventory.stock_quantity > 0)
+        .order_by(WarehouseInventory.batch_start_date, WarehouseInventory.id)
+        .with_for_update(skip_locked=True)
+    )
+    if storage_location is not None:
+        query = query.where(
+            WarehouseInventory.storage_location == storage_location)
+    if exclude_location is not None:
+        query = query.where(
+            WarehouseInventory.storage_location != exclude_location)
+
+    allocations = []
+    remaining = quantity
+    chunk_size = ALLOCATION_FIRST_CHUNK
+    last_key: Optional[tuple[datetime.datetime, int]] = None
+    while remaining > 0:
+        chunk_query = query.limit(chunk_size)
+        if last_key is not None:
+            chunk_query = chunk_query.where(tuple_(
+                WarehouseInventory.batch_start_date,
+                WarehouseInventory.id) > last_key)
+        rows = (await db.execute(chunk_query)).all()
+        for row in rows:
+            taken = min(row.stock_quantity, remaining)
+            allocations.append(Allocation(
+                inventory_id=row.id, batch_id=row.batch_id,
+                product_id=product_id,
+                storage_location=row.storage_location, quantity=taken))
+            remaining -= taken
+            if remaining == 0:
+                break
+        if len(rows) < chunk_size:
+            break
+        last_key = (rows[-1].batch_start_date, rows[-1].id)
+        chunk_size = min(chunk_size * 2, ALLOCATION_MAX_CHUNK)
+    return allocations
+
+
+async def allocate_fifo(
+        db: AsyncSession,
+        product_id: int,
+        quantity: int,
+        preferred_location: Optional[str] = None) -> list[Allocation]:
+    """
+    Подбирает партии продукта на quantity единиц: сначала в
+    preferred_location, затем в остальных местах хранения.
+    """
+    if preferred_location is None:
+        return await pick_available_batches(db, product_id, quantity)
+    allocations = await pick_available_batches(
+        db, product_id, quantity, storage_location=preferred_location)
+    allocated = sum(allocation.quantity for allocation in allocations)
+    if allocated < quantity:
+        allocations += await pick_available_batches(
+            db, product_id, quantity - allocated,
+            exclude_location=preferred_location)
+    return allocations
+
+
+async def apply_allocations(
+        db: AsyncSession, allocations: Sequence[Allocation]):
+    """Списывает выбранное количество одним UPDATE."""
+    if not allocations:
+        return
+    await db.execute(text(APPLY_ALLOCATIONS), {
+        'inventory_ids': [allocation.inventory_id
+                          for allocation in allocations],
+        'quantities': [allocation.quantity for allocation in allocations]})
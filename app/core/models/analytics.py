@@ -0,0 +1,158 @@
+import asyncio
+import datetime
+import logging
+from typing import Optional, Sequence
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.constants import ANALYTICS_REFRESH_LOCK_ID
+from core.models.models import ProductDailyStats
+
+logger = logging.getLogger(__name__)
+
+# Забираем накопленные триггерами корзины и пересчитываем только их.
+# Удаляются только видимые отметки (id <= max(id) в снимке запроса):
+# отметка транзакции, которая еще не зафиксирована, останется до
+# следующего пересчета, а не потеряется вместе с уже видимой.
+# Корзины, где все показатели обнулились, удаляются из агрегатов.
+REFRESH_DIRTY_BUCKETS = '''
+WITH claimed AS (
+    DELETE FROM analytics_dirty_buckets
+    WHERE id <= (SELECT max(id) FROM analytics_dirty_buckets)
+    RETURNING product_id, day
+),
+dirty AS (
+    SELECT DISTINCT product_id, day FROM claimed
+),
+started AS (
+    SELECT pb.product_id, d.day, count(*) AS batches_started
+    FROM dirty d
+    JOIN production_batches pb
+      ON pb.product_id = d.product_id
+     AND pb.start_date >= d.day::timestamp AT TIME ZONE 'UTC'
+     AND pb.start_date < (d.day + 1)::timestamp AT TIME ZONE 'UTC'
+    GROUP BY pb.product_id, d.day
+),
+completed AS (
+    SELECT pb.product_id, d.day,
+           coalesce(sum(pb.quantity_in_batch), 0) AS units_completed
+    FROM dirty d
+    JOIN production_batches pb
+      ON pb.product_id = d.product_id
+     AND pb.completed_at >= d.day::timestamp AT TIME ZONE 'UTC'
+     AND pb.completed_at < (d.day + 1)::timestamp AT TIME ZONE 'UTC'
+    GROUP BY pb.product_id, d.day
+),
+received AS (
+    SELECT wi.product_id, d.day,
+           coalesce(sum(wi.quantity_received), 0) AS units_received
+    FROM dirty d
+    JOIN warehouse_inventory wi
+      ON wi.product_id = d.product_id
+     AND wi.received_at >= d.day::timestamp AT TIME ZONE 'UTC'
+     AND wi.received_at < (d.day + 1)::timestamp AT TIME ZONE 'UTC'
+    GROUP BY wi.product_id, d.day
+),
+shipped AS (
+    SELECT pb.product_id, d.day,
+           coalesce(sum(coalesce(si.quantity, wi.quantity_received,
+                                 pb.quantity_in_batch)), 0) AS units_shipped
+    FROM dirty d
+    JOIN shipment s
+      ON s.shipped_at >= d.day AND s.shipped_at < d.day + 1
+     AND s.status <> 'CANCELLED'
+    JOIN shipment_items si
+      ON si.shipment_id = s.id AND si.shipped_at = s.shipped_at
+    JOIN production_batches pb
+      ON pb.id = si.batch_id AND pb.product_id = d.product_id
+    LEFT JOIN warehouse_inventory wi ON wi.batch_id = si.batch_id
+    GROUP BY pb.product_id, d.day
+),
+fresh AS (
+    SELECT d.product_id, d.day,
+           coalesce(b.batches_started, 0) AS batches_started,
+           coalesce(c.units_completed, 0) AS units_completed,
+           coalesce(r.units_received, 0) AS units_received,
+           coalesce(s.units_shipped, 0) AS units_shipped
+    FROM dirty d
+    LEFT JOIN started b USING (product_id, day)
+    LEFT JOIN completed c USING (product_id, day)
+    LEFT JOIN received r USING (product_id, day)
+    LEFT JOIN shipped s USING (product_id, day)
+),
+emptied AS (
+    DELETE FROM product_daily_stats st
+    USING fresh f
+    WHERE st.product_id = f.product_id AND st.day = f.day
+      AND f.batches_started = 0 AND f.units_completed = 0
+      AND f.units_received = 0 AND f.units_shipped = 0
+    RETURNING st.product_id
+),
+upserted AS (
+    INSERT INTO product_daily_stats (product_id, day, batches_started,
+                                     units_completed, units_received,
+                                     units_shipped)
+    SELECT f.product_id, f.day, f.batches_started, f.units_completed,
+           f.units_received, f.units_shipped
+    FROM fresh f
+    JOIN products p ON p.id = f.product_id
+    WHERE f.batches_started > 0 OR f.units_completed > 0
+       OR f.units_received > 0 OR f.units_shipped > 0
+    ON CONFLICT (product_id, day) DO UPDATE SET
+        batches_started = EXCLUDED.batches_started,
+        units_completed = EXCLUDED.units_completed,
+        units_received = EXCLUDED.units_received,
+        units_shipped = EXCLUDED.units_shipped
+    RETURNING product_id
+)
+SELECT count(*) FROM fresh
+'''
+
+
+async def refresh_daily_stats(db: AsyncSession) -> Optional[int]:
+    """
+    Пересчитывает дневные агрегаты для затронутых корзин.
+    Возвращает число пересчитанных корзин или None, если пересчет
+    уже выполняется в другом процессе.
+    """
+    locked = await db.execute(
+        text('SELECT pg_try_advisory_xact_lock(:lock_id)'),
+        {'lock_id': ANALYTICS_REFRESH_LOCK_ID})
+    if not locked.scalar():
+        await db.rollback()
+        return None
+    result = await db.execute(text(REFRESH_DIRTY_BUCKETS))
+    refreshed = result.scalar()
+    await db.commit()
+    return refreshed
+
+
+async def refresh_daily_stats_periodically(sessionmanager, interval: float):
+    """Фоново пересчитывает агрегаты раз в interval секунд."""
+    while True:
+        try:
+            async with sessionmanager.session() as db:
+                await refresh_daily_stats(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception('Daily stats refresh failed')
+        await asyncio.sleep(interval)
+
+
+async def get_daily_stats(
+        db: AsyncSession,
+        date_from: datetime.date,
+        date_to: datetime.date,
+        product_ids: Optional[Sequence[int]] = None
+) -> Sequence[ProductDailyStats]:
+    """Возвращает дневные агрегаты за период, опционально по продуктам."""
+    query = select(ProductDailyStats).where(
+        ProductDailyStats.day >= date_from,
+        ProductDailyStats.day <= date_to)
+    if product_ids:
+        query = query.where(ProductDailyStats.product_id.in_(product_ids))
+    result = await db.execute(query.order_by(
+        ProductDailyStats.day, ProductDailyStats.product_id))
+    return result.scalars().all()
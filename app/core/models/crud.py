@@ -1,21 +1,38 @@
 import string
 import random
-from typing import Type, TypeVar, Optional
+from typing import Any, Type, TypeVar, Optional, Sequence
 
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import ARRAY
 from fastapi import HTTPException
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import select, any_, bindparam, Integer
 from starlette import status
 
-from core.models.models import Base
-from core.constants import BATCH_DOES_NOT_EXIST, BATCH_EXISTS_IN_SHIPMENTS
-from core.models import ProductionBatches
+from core.models.models import Base, Product, WarehouseInventory
+from core.schemas.schemas import BaseConfigModel, sparse_schema
+from core.constants import (BATCH_DOES_NOT_EXIST, BATCH_EXISTS_IN_SHIPMENTS,
+                            BATCH_IDS_REPORTED_MAX, UNKNOWN_FIELDS,
+                            MULTI_GET_MAX_IDS, MULTI_GET_IDS_ERROR)
 
 
 ModelType = TypeVar('ModelType', bound=Base)
 ItemType = TypeVar('ItemType', bound=BaseModel)
 
+# Поля ответа и колонки, из которых они выбираются.
+PRODUCT_FIELD_COLUMNS = {
+    'id': Product.id,
+    'product_uuid': Product.product_uuid,
+    'name': Product.product_name,
+    'name_model': Product.name_model,
+    'status': Product.status,
+}
+INVENTORY_FIELD_COLUMNS = {
+    'product_id': WarehouseInventory.product_id,
+    'stock_quantity': WarehouseInventory.stock_quantity,
+    'storage_location': WarehouseInventory.storage_location,
+}
+
 
 async def get_or_404(
         db: AsyncSession,
@@ -23,7 +40,9 @@ async def get_or_404(
         identifier: Optional[int] = None,
         uuid_identifier: Optional[str] = None
 ) -> ModelType:
-    """Получает объект по ID или UUID, возвращает 404, если объект не найден."""
+    """
+    Получает объект по ID или UUID, возвращает 404, если объект не найден.
+    """
     identifier_info = identifier if identifier else uuid_identifier
     exception = HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -72,22 +91,107 @@ async def joined_production_batch_with_product(
     return fetched_data
 
 
-async def filter_batch_ids(
+def ids_param(identifiers: Sequence[int], name: str = 'ids'):
+    """
+    Передает список ID одним параметром-массивом (= ANY(:ids)),
+    а не отдельным параметром на каждый ID, как IN.
+    """
+    return any_(bindparam(name, value=list(identifiers),
+                          type_=ARRAY(Integer)))
+
+
+def batch_ids_param(batch_ids: Sequence[int]):
+    return ids_param(batch_ids, name='batch_ids')
+
+
+def batch_ids_error(message: str, batch_ids: Sequence[int]) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail={'error': message,
+                'batch_ids': list(batch_ids[:BATCH_IDS_REPORTED_MAX]),
+                'total': len(batch_ids)})
+
+
+async def lock_shippable_batches(
+        db: AsyncSession, batch_ids: Sequence[int]) -> dict[int, int]:
+    """
+    Блокирует складские записи партий заказа и проверяет, что их можно
+    отгрузить: партия принята на склад и у нее есть свободный остаток.
+    Проверка идет по состоянию склада, а не по истории отгрузок, которая
+    может быть уже архивирована. Возвращает остаток по каждой партии;
+    в ошибке перечисляются конкретные ID.
+    """
+    result = await db.execute(
+        select(WarehouseInventory.batch_id, WarehouseInventory.in_shipment,
+               WarehouseInventory.stock_quantity)
+        .where(WarehouseInventory.batch_id == batch_ids_param(batch_ids))
+        .order_by(WarehouseInventory.batch_id)
+        .with_for_update())
+    found = {row.batch_id: row for row in result}
+
+    missing_ids = [batch_id for batch_id in batch_ids
+                   if batch_id not in found]
+    if missing_ids:
+        raise batch_ids_error(BATCH_DOES_NOT_EXIST, missing_ids)
+    shipped_ids = [batch_id for batch_id in batch_ids
+                   if found[batch_id].in_shipment
+                   or found[batch_id].stock_quantity == 0]
+    if shipped_ids:
+        raise batch_ids_error(BATCH_EXISTS_IN_SHIPMENTS, shipped_ids)
+    return {batch_id: found[batch_id].stock_quantity
+            for batch_id in batch_ids}
+
+
+def parse_fields(fields: Optional[str],
+                 field_columns: dict[str, Any]) -> tuple[str, ...]:
+    """
+    Разбирает параметр fields ('id,name'). Поля возвращаются в порядке
+    схемы ответа, без fields - все поля.
+    """
+    if not fields:
+        return tuple(field_columns)
+    requested = {name.strip() for name in fields.split(',') if name.strip()}
+    unknown = sorted(requested - field_columns.keys())
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={'error': UNKNOWN_FIELDS, 'fields': unknown,
+                    'allowed': list(field_columns)})
+    return tuple(name for name in field_columns if name in requested)
+
+
+def fields_cache_key(cache_key: str, field_names: tuple[str, ...],
+                     field_columns: dict[str, Any]) -> str:
+    """Ключ кеша для набора полей; полный набор хранится под cache_key."""
+    if field_names == tuple(field_columns):
+        return cache_key
+    return f'{cache_key}:fields={",".join(field_names)}'
+
+
+async def select_fields(
         db: AsyncSession,
-        model: ProductionBatches,
-        batch_ids: list,
-        check_shipments: bool = False):
-    """Фильтрует идентификаторы партий и проверяет их наличие."""
-    result = await db.execute(select(model).filter(
-        model.batch_id.in_(batch_ids)))
-
-    result_batches = result.scalars().all()
-    if len(result_batches) != len(batch_ids) and not check_shipments:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=BATCH_DOES_NOT_EXIST)
-    elif result_batches and check_shipments:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=BATCH_EXISTS_IN_SHIPMENTS)
-    return result_batches
+        schema: Type[BaseConfigModel],
+        field_columns: dict[str, Any],
+        field_names: tuple[str, ...],
+        *criteria) -> list[dict[str, Any]]:
+    """Выбирает из БД только колонки запрошенных полей."""
+    response_schema = sparse_schema(schema, field_names)
+    result = await db.execute(
+        select(*(field_columns[name].label(name) for name in field_names))
+        .where(*criteria))
+    return [response_schema.model_validate(dict(row._mapping)).model_dump()
+            for row in result]
+
+
+def check_multi_get_ids(identifiers: Sequence[int]):
+    if not identifiers or len(identifiers) > MULTI_GET_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={'error': MULTI_GET_IDS_ERROR,
+                    'total': len(identifiers), 'max': MULTI_GET_MAX_IDS})
 
 
+def not_found_marker(model: Type[ModelType], identifier: int) -> dict:
+    """Элемент ответа мульти-запроса для отсутствующего объекта."""
+    return {'id': identifier,
+            'error': f'{model.__name__} with ID {identifier} is not found'}
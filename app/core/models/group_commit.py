@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import os
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import text
+from starlette import status
+
+from core.constants import (STAGE_GROUP_COMMIT_WINDOW_MS,
+                            STAGE_GROUP_COMMIT_MAX_BATCH)
+from core.models.db import sessionmanager
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Самосоединение previous видит строки до обновления и отдает прошлую
+# стадию каждой партии.
+UPDATE_STAGES = '''
+    UPDATE production_batches AS pb
+    SET current_stage = updates.stage
+    FROM unnest(CAST(:batch_ids AS integer[]),
+                CAST(:stages AS varchar[])) AS updates (id, stage),
+         production_batches AS previous
+    WHERE pb.id = updates.id AND previous.id = pb.id
+    RETURNING pb.id, pb.product_id, pb.start_date, pb.current_stage,
+              pb.quantity_in_batch, previous.current_stage AS previous_stage
+'''
+
+PendingUpdate = tuple[int, str, asyncio.Future]
+
+
+def split_into_rounds(
+        pending: list[PendingUpdate]) -> list[list[PendingUpdate]]:
+    """
+    Раскладывает обновления по раундам так, чтобы в одном UPDATE каждая
+    партия встречалась один раз, сохраняя порядок обновлений одной партии.
+    """
+    rounds: list[list[PendingUpdate]] = []
+    next_round: dict[int, int] = {}
+    for update in pending:
+        round_index = next_round.get(update[0], 0)
+        if round_index == len(rounds):
+            rounds.append([])
+        rounds[round_index].append(update)
+        next_round[update[0]] = round_index + 1
+    return rounds
+
+
+class StageUpdateBatcher:
+    """
+    Групповая фиксация смен стадий партий. Обновления, пришедшие в
+    пределах окна window_ms (или пока их не наберется max_batch),
+    применяются одним UPDATE в одной транзакции; каждый вызывающий
+    получает свою строку результата.
+    """
+
+    def __init__(self, sessionmanager, enabled: bool = False,
+                 window_ms: float = STAGE_GROUP_COMMIT_WINDOW_MS,
+                 max_batch: int = STAGE_GROUP_COMMIT_MAX_BATCH):
+        self.sessionmanager = sessionmanager
+        self.enabled = enabled
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue[PendingUpdate] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    async def submit(self, batch_id: int, new_stage: str) -> Any:
+        """Ставит обновление в очередь и ждет результата его группы."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((batch_id, new_stage, future))
+        return await future
+
+    async def _collect(self) -> list[PendingUpdate]:
+        loop = asyncio.get_running_loop()
+        pending = [await self._queue.get()]
+        deadline = loop.time() + self.window
+        while len(pending) < self.max_batch:
+            if not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                pending.append(
+                    await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return pending
+
+    async def _run(self):
+        while True:
+            pending = await self._collect()
+            try:
+                await self.flush(pending)
+            except Exception as error:
+                logger.exception('Group commit of %d stage updates failed',
+                                 len(pending))
+                for _, _, future in pending:
+                    if not future.done():
+                        future.set_exception(error)
+
+    async def flush(self, pending: list[PendingUpdate]):
+        results = []
+        async with self.sessionmanager.session() as db:
+            for round_updates in split_into_rounds(pending):
+                result = await db.execute(text(UPDATE_STAGES), {
+                    'batch_ids': [batch_id for batch_id, _, _
+                                  in round_updates],
+                    'stages': [stage for _, stage, _ in round_updates]})
+                rows = {row.id: row for row in result}
+                results.extend((batch_id, future, rows.get(batch_id))
+                               for batch_id, _, future in round_updates)
+            await db.commit()
+        for batch_id, future, row in results:
+            if future.done():
+                continue
+            if row is None:
+                future.set_exception(HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f'ProductionBatches with ID {batch_id} '
+                           f'is not found'))
+            else:
+                future.set_result(row)
+
+
+stage_update_batcher = StageUpdateBatcher(
+    sessionmanager,
+    enabled=os.getenv('STAGE_GROUP_COMMIT', 'false').lower() == 'true',
+    window_ms=float(os.getenv('STAGE_GROUP_COMMIT_WINDOW_MS',
+                              STAGE_GROUP_COMMIT_WINDOW_MS)),
+    max_batch=int(os.getenv('STAGE_GROUP_COMMIT_MAX_BATCH',
+                            STAGE_GROUP_COMMIT_MAX_BATCH)))
@@ -0,0 +1,231 @@
+import asyncio
+import codecs
+import csv
+import json
+import time
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.constants import (IMPORT_FORMATS, IMPORT_CHUNK_SIZE,
+                            IMPORT_READ_SIZE, IMPORT_MAX_REJECTED_REPORTED,
+                            IMPORT_STAGING_TABLE)
+from core.schemas.schemas import ProductImport
+
+PRODUCT_IMPORT_COLUMNS = tuple(ProductImport.model_fields)
+
+CREATE_STAGING_TABLE = f'''
+    CREATE TEMP TABLE IF NOT EXISTS {IMPORT_STAGING_TABLE} (
+        row_no bigint NOT NULL,
+        product_uuid varchar NOT NULL,
+        product_name varchar(255) NOT NULL,
+        serial_number varchar(255) NOT NULL,
+        name_model varchar(255) NOT NULL,
+        status varchar(50) NOT NULL
+    ) ON COMMIT DROP
+'''
+
+# Одна и та же позиция может встретиться в файле несколько раз, берем
+# последнюю. Строки, чьи уникальные поля заняты другим продуктом в
+# таблице или другим product_uuid в этом же файле, пропускаем, чтобы они
+# не роняли всю загрузку.
+MERGE_STAGING_INTO_PRODUCTS = f'''
+    INSERT INTO products (product_uuid, product_name, serial_number,
+                          name_model, status)
+    SELECT latest.product_uuid, latest.product_name, latest.serial_number,
+           latest.name_model, latest.status
+    FROM (
+        SELECT deduplicated.*,
+               count(*) OVER (PARTITION BY product_name) AS name_claims,
+               count(*) OVER (PARTITION BY serial_number) AS serial_claims,
+               count(*) OVER (PARTITION BY name_model) AS model_claims
+        FROM (
+            SELECT DISTINCT ON (product_uuid) *
+            FROM {IMPORT_STAGING_TABLE}
+            ORDER BY product_uuid, row_no DESC
+        ) AS deduplicated
+    ) AS latest
+    WHERE latest.name_claims = 1
+      AND latest.serial_claims = 1
+      AND latest.model_claims = 1
+      AND NOT EXISTS (
+        SELECT 1 FROM products p
+        WHERE p.product_name = latest.product_name
+          AND p.product_uuid <> latest.product_uuid)
+      AND NOT EXISTS (
+        SELECT 1 FROM products p
+        WHERE p.serial_number = latest.serial_number
+          AND p.product_uuid <> latest.product_uuid)
+      AND NOT EXISTS (
+        SELECT 1 FROM products p
+        WHERE p.name_model = latest.name_model
+          AND p.product_uuid <> latest.product_uuid)
+    ON CONFLICT (product_uuid) DO UPDATE SET
+        product_name = EXCLUDED.product_name,
+        serial_number = EXCLUDED.serial_number,
+        name_model = EXCLUDED.name_model,
+        status = EXCLUDED.status
+'''
+
+COUNT_UNIQUE_STAGED = (f'SELECT count(DISTINCT product_uuid) '
+                       f'FROM {IMPORT_STAGING_TABLE}')
+
+
+def detect_import_format(content_type: Optional[str]) -> Optional[str]:
+    """Определяет формат загрузки по заголовку Content-Type."""
+    if not content_type:
+        return None
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return IMPORT_FORMATS.get(media_type)
+
+
+async def iter_file_chunks(path: str) -> AsyncIterator[bytes]:
+    """Читает файл кусками, не загружая его в память целиком."""
+    with open(path, 'rb') as file:
+        while chunk := await asyncio.to_thread(file.read, IMPORT_READ_SIZE):
+            yield chunk
+
+
+async def iter_lines(
+        chunks: AsyncIterable[bytes]) -> AsyncIterator[tuple[int, str]]:
+    """Разбивает поток байтов на пронумерованные строки."""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer = ''
+    line_no = 0
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            line_no += 1
+            yield line_no, line.rstrip('\r')
+    buffer += decoder.decode(b'', final=True)
+    if buffer.strip():
+        yield line_no + 1, buffer.rstrip('\r')
+
+
+async def iter_csv_records(
+        lines: AsyncIterable[tuple[int, str]]
+) -> AsyncIterator[tuple[int, object]]:
+    """Превращает строки CSV в словари по заголовку из первой строки."""
+    header = None
+    async for line_no, line in lines:
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [column.strip() for column in values]
+            continue
+        if len(values) != len(header):
+            yield line_no, (f'expected {len(header)} columns, '
+                            f'got {len(values)}')
+            continue
+        yield line_no, dict(zip(header, values))
+
+
+async def iter_ndjson_records(
+        lines: AsyncIterable[tuple[int, str]]
+) -> AsyncIterator[tuple[int, object]]:
+    """Превращает строки NDJSON в словари."""
+    async for line_no, line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as error:
+            yield line_no, f'invalid JSON: {error.msg}'
+            continue
+        if not isinstance(record, dict):
+            yield line_no, 'expected a JSON object'
+            continue
+        yield line_no, record
+
+
+class ImportReport:
+    """Собирает статистику загрузки каталога."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows_read = 0
+        self.rows_staged = 0
+        self.rows_rejected = 0
+        self.rejected = []
+
+    def reject(self, line_no: int, errors: list[str]):
+        self.rows_rejected += 1
+        if len(self.rejected) < IMPORT_MAX_REJECTED_REPORTED:
+            self.rejected.append({'line': line_no, 'errors': errors})
+
+    def as_dict(self, upserted: int, conflicting: int) -> dict:
+        elapsed = time.perf_counter() - self.started
+        rows_per_second = self.rows_read / elapsed if elapsed else 0
+        return {
+            'rows_read': self.rows_read,
+            'rows_upserted': upserted,
+            'rows_rejected': self.rows_rejected,
+            'rows_conflicting': conflicting,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(rows_per_second, 1),
+            'rejected': self.rejected,
+        }
+
+
+def validation_messages(error: ValidationError) -> list[str]:
+    """Сокращает ошибки pydantic до строк вида 'поле: сообщение'."""
+    return ['.'.join(str(loc) for loc in item['loc']) + ': ' + item['msg']
+            for item in error.errors()]
+
+
+async def import_products(
+        db: AsyncSession,
+        chunks: AsyncIterable[bytes],
+        import_format: str) -> dict:
+    """
+    Потоково валидирует строки каталога, загружает их через COPY во
+    временную таблицу и одним запросом вливает в products по product_uuid.
+    Фиксировать транзакцию должен вызывающий код.
+    """
+    report = ImportReport()
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+    await db.execute(text(CREATE_STAGING_TABLE))
+
+    lines = iter_lines(chunks)
+    records = (iter_csv_records(lines) if import_format == 'csv'
+               else iter_ndjson_records(lines))
+    buffer = []
+
+    async def flush():
+        await driver_connection.copy_records_to_table(
+            IMPORT_STAGING_TABLE, records=buffer,
+            columns=('row_no', *PRODUCT_IMPORT_COLUMNS))
+        report.rows_staged += len(buffer)
+        buffer.clear()
+
+    async for line_no, record in records:
+        report.rows_read += 1
+        if isinstance(record, str):
+            report.reject(line_no, [record])
+            continue
+        try:
+            product = ProductImport.model_validate(
+                {key: value for key, value in record.items()
+                 if value not in ('', None)})
+        except ValidationError as error:
+            report.reject(line_no, validation_messages(error))
+            continue
+        buffer.append((line_no, *(getattr(product, column)
+                                  for column in PRODUCT_IMPORT_COLUMNS)))
+        if len(buffer) >= IMPORT_CHUNK_SIZE:
+            await flush()
+    if buffer:
+        await flush()
+
+    if not report.rows_staged:
+        return report.as_dict(upserted=0, conflicting=0)
+    unique_staged = (await db.execute(text(COUNT_UNIQUE_STAGED))).scalar()
+    result = await db.execute(text(MERGE_STAGING_INTO_PRODUCTS))
+    return report.as_dict(upserted=result.rowcount,
+                          conflicting=unique_staged - result.rowcount)
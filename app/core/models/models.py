@@ -1,12 +1,14 @@
-from datetime import datetime
+from datetime import date, datetime
 
-from sqlalchemy import (Integer, String, ForeignKey, Boolean,
-                        DateTime, func, UniqueConstraint, CheckConstraint)
+from sqlalchemy import (Integer, BigInteger, String, ForeignKey, Boolean, Date,
+                        DateTime, func, UniqueConstraint, CheckConstraint,
+                        Index, text)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship, Mapped, mapped_column, Session
 
 from .db import Base
 from app.core.constants import (PRODUCTS_STATUSES, PRODUCTION_BATCHES_STATUSES,
-                                SHIPMENTS_STATUSES)
+                                SHIPMENTS_STATUSES, PRODUCT_SEARCH_COLUMNS)
 
 
 class BaseEntity(Base):
@@ -25,6 +27,10 @@ class Product(BaseEntity):
     __table_args__ = (
         CheckConstraint(f'status in {PRODUCTS_STATUSES}',
                         name='check_product_status'),
+        *(Index(f'ix_products_{column}_trgm', column,
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'})
+          for column in PRODUCT_SEARCH_COLUMNS),
     )
     product_uuid: Mapped[str] = mapped_column(
         index=True, nullable=False, unique=True
@@ -64,7 +70,11 @@ class ProductionBatches(BaseEntity):
     __table_args__ = (
         CheckConstraint(f'current_stage in {PRODUCTION_BATCHES_STATUSES}',
                         name='check_stage'),
-        CheckConstraint('quantity_in_batch >= 1', name='check_quantity_batch')
+        CheckConstraint('quantity_in_batch >= 1', name='check_quantity_batch'),
+        Index('ix_production_batches_product_id_start_date',
+              'product_id', 'start_date'),
+        Index('ix_production_batches_product_id_completed_at',
+              'product_id', 'completed_at'),
     )
 
     start_date: Mapped[datetime] = mapped_column(
@@ -72,6 +82,9 @@ class ProductionBatches(BaseEntity):
     current_stage: Mapped[str] = mapped_column(String(50), nullable=False,
                                                default='INITIALIZED')
     quantity_in_batch: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Заполняется триггером при переходе партии в стадию COMPLETED.
+    completed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=True)
     product_id: Mapped[int] = mapped_column(Integer, ForeignKey(
         'products.id'))
     product: Mapped['Product'] = relationship(
@@ -101,6 +114,15 @@ class WarehouseInventory(BaseEntity):
     __tablename__ = 'warehouse_inventory'
     __table_args__ = (
         CheckConstraint('stock_quantity >= 0', name='check_amount'),
+        Index('ix_warehouse_inventory_product_id_received_at',
+              'product_id', 'received_at'),
+        Index('ix_warehouse_inventory_batch_id', 'batch_id'),
+        Index('ix_warehouse_inventory_fifo',
+              'product_id', 'batch_start_date', 'id',
+              postgresql_where=text('NOT in_shipment AND stock_quantity > 0')),
+        Index('ix_warehouse_inventory_fifo_location',
+              'product_id', 'storage_location', 'batch_start_date', 'id',
+              postgresql_where=text('NOT in_shipment AND stock_quantity > 0')),
     )
 
     product_id: Mapped[int] = mapped_column(ForeignKey(
@@ -110,6 +132,11 @@ class WarehouseInventory(BaseEntity):
     product: Mapped['Product'] = relationship(
         'Product', back_populates='warehouse_inventory')
     stock_quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    quantity_received: Mapped[int] = mapped_column(Integer, nullable=True)
+    received_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False)
+    batch_start_date: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False)
     batch_id: Mapped[int] = mapped_column(
         ForeignKey('production_batches.id'), nullable=False)
     batch: Mapped['ProductionBatches'] = relationship(
@@ -128,6 +155,17 @@ class WarehouseInventory(BaseEntity):
                 f' located at {self.storage_location}')
 
 
+class ShipmentOrderId(Base):
+    """
+    Зарезервированные номера заказов. Держит уникальность order_id по
+    всем секциям shipment; строки добавляет триггер при вставке отгрузки.
+    """
+
+    __tablename__ = 'shipment_order_ids'
+
+    order_id: Mapped[str] = mapped_column(String(255), primary_key=True)
+
+
 class Shipment(BaseEntity):
     """
     Класс для представления shipment. Содержит поля:
@@ -139,10 +177,12 @@ class Shipment(BaseEntity):
     __table_args__ = (
         CheckConstraint(f'status in {SHIPMENTS_STATUSES}',
                         name='check_shipment_status'),
+        Index('ix_shipment_shipped_at', 'shipped_at'),
     )
 
     order_id: Mapped[str] = mapped_column(
-        String(255), nullable=False, unique=True)
+        String(255), ForeignKey('shipment_order_ids.order_id'),
+        nullable=False, index=True)
     status: Mapped[str] = mapped_column(
         String(50), nullable=False, default='PENDING')
     shipped_at: Mapped[datetime] = mapped_column(
@@ -171,14 +211,86 @@ class ShipmentItems(BaseEntity):
     __table_args__ = (
         UniqueConstraint('shipment_id', 'batch_id',
                          name='check_batche_shipment'),
+        Index('ix_shipment_items_shipment_id', 'shipment_id'),
     )
 
     shipment_id: Mapped[int] = mapped_column(
         ForeignKey('shipment.id', ondelete='CASCADE'))
     batch_id: Mapped[int] = mapped_column(ForeignKey('production_batches.id',
                                                      ondelete='CASCADE'))
+    quantity: Mapped[int] = mapped_column(Integer, nullable=True)
 
     shipment: Mapped['Shipment'] = relationship(
         'Shipment', back_populates='shipment_items')
     batch: Mapped['ProductionBatches'] = relationship(
         'ProductionBatches', back_populates='shipment_items')
+
+
+class ProductDailyStats(Base):
+    """
+    Дневные агрегаты по продукту: запущенные партии, произведенные,
+    принятые на склад и отгруженные единицы. Пересчитываются только
+    для корзин из AnalyticsDirtyBucket.
+    """
+
+    __tablename__ = 'product_daily_stats'
+    __table_args__ = (
+        Index('ix_product_daily_stats_day', 'day'),
+    )
+
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    batches_started: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0)
+    units_completed: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0)
+    units_received: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0)
+    units_shipped: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return (f'<ProductDailyStats(product_id={self.product_id},'
+                f' day={self.day}>')
+
+
+class AnalyticsDirtyBucket(Base):
+    """
+    Корзины (продукт, день), затронутые с последнего пересчета.
+    Заполняется триггерами на исходных таблицах, по строке на каждое
+    изменение: отметки незафиксированных транзакций переживают пересчет.
+    """
+
+    __tablename__ = 'analytics_dirty_buckets'
+
+    id: Mapped[int] = mapped_column(
+        BigInteger, primary_key=True, autoincrement=True)
+    product_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+
+
+class InventoryEvent(Base):
+    """
+    Журнал изменений остатков, стадий партий и статусов отгрузок.
+    Заполняется триггерами, которые также шлют NOTIFY; по id клиенты
+    ленты событий продолжают чтение после переподключения.
+    """
+
+    __tablename__ = 'inventory_events'
+    __table_args__ = (
+        Index('ix_inventory_events_created_at', 'created_at'),
+    )
+
+    id: Mapped[int] = mapped_column(
+        BigInteger, primary_key=True, autoincrement=True)
+    event_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    product_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    storage_location: Mapped[str] = mapped_column(String(50), nullable=True)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return (f'<InventoryEvent(id={self.id},'
+                f' event_type="{self.event_type}">')
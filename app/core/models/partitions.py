@@ -0,0 +1,180 @@
+import asyncio
+import datetime
+import gzip
+import logging
+import os
+import re
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.constants import (PARTITIONED_SHIPMENT_TABLES,
+                            SHIPMENT_ITEMS_SHIPMENT_FKEY,
+                            PARTITION_MAINTENANCE_LOCK_ID)
+
+logger = logging.getLogger(__name__)
+
+PARTITION_SUFFIX_REGEX = re.compile(r'_y(\d{4})m(\d{2})$')
+
+LIST_PARTITIONS = '''
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = :table
+    ORDER BY child.relname
+'''
+
+
+def month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    month_index = month.year * 12 + month.month - 1 + months
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime.date) -> str:
+    return f'{table}_y{month.year}m{month.month:02d}'
+
+
+def partition_month(name: str) -> Optional[datetime.date]:
+    """Извлекает месяц из имени секции вида '<таблица>_y2024m11'."""
+    match = PARTITION_SUFFIX_REGEX.search(name)
+    if match is None:
+        return None
+    return datetime.date(int(match.group(1)), int(match.group(2)), 1)
+
+
+async def list_partitions(
+        db: AsyncSession, table: str) -> dict[datetime.date, str]:
+    """Возвращает помесячные секции таблицы."""
+    result = await db.execute(text(LIST_PARTITIONS), {'table': table})
+    partitions = {}
+    for name in result.scalars():
+        month = partition_month(name)
+        if month is not None:
+            partitions[month] = name
+    return partitions
+
+
+async def ensure_shipment_partitions(
+        db: AsyncSession, months_ahead: int,
+        today: Optional[datetime.date] = None) -> list[str]:
+    """
+    Создает недостающие секции shipment и shipment_items с текущего
+    месяца на months_ahead месяцев вперед. Воркеры создают секции по
+    очереди под advisory-блокировкой.
+    """
+    current_month = month_start(today or datetime.date.today())
+    await db.execute(text('SELECT pg_advisory_xact_lock(:lock_id)'),
+                     {'lock_id': PARTITION_MAINTENANCE_LOCK_ID})
+    created = []
+    for table in PARTITIONED_SHIPMENT_TABLES:
+        existing = await list_partitions(db, table)
+        for offset in range(months_ahead + 1):
+            month = add_months(current_month, offset)
+            if month in existing:
+                continue
+            name = partition_name(table, month)
+            await db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month}') "
+                f"TO ('{add_months(month, 1)}')"))
+            created.append(name)
+    await db.commit()
+    return created
+
+
+async def ensure_shipment_partitions_periodically(
+        sessionmanager, months_ahead: int, interval: float):
+    """
+    Фоново досоздает секции раз в interval секунд: процесс, работающий
+    дольше months_ahead месяцев без перезапуска, не должен остаться без
+    секции для новых отгрузок.
+    """
+    while True:
+        try:
+            async with sessionmanager.session() as db:
+                created = await ensure_shipment_partitions(db, months_ahead)
+            if created:
+                logger.info('Created shipment partitions: %s',
+                            ', '.join(created))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception('Could not create upcoming shipment partitions')
+        await asyncio.sleep(interval)
+
+
+async def export_table(db: AsyncSession, table: str, path: str):
+    """Выгружает таблицу в сжатый CSV через COPY."""
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    with gzip.open(path, 'wb') as archive:
+        async def write(chunk: bytes):
+            archive.write(chunk)
+
+        await raw_connection.driver_connection.copy_from_table(
+            table, output=write, format='csv', header=True)
+
+
+async def archive_shipment_partitions(
+        db: AsyncSession, older_than_months: int,
+        archive_dir: Optional[str] = None,
+        drop: bool = False,
+        today: Optional[datetime.date] = None) -> list[str]:
+    """
+    Отсоединяет секции отгрузок старше older_than_months месяцев.
+    Если указан archive_dir, секции выгружаются в '<секция>.csv.gz'.
+    При drop=True отсоединенные таблицы удаляются; это разрешено только
+    вместе с archive_dir, чтобы история не удалялась без копии. Каждый
+    месяц обрабатывается в своей транзакции: ошибка выгрузки откатывает
+    отсоединение.
+    """
+    if drop and not archive_dir:
+        raise ValueError('archive_dir is required to drop partitions')
+    cutoff = add_months(month_start(today or datetime.date.today()),
+                        -older_than_months)
+    shipment_table, items_table = PARTITIONED_SHIPMENT_TABLES
+    shipments = await list_partitions(db, shipment_table)
+    items = await list_partitions(db, items_table)
+    if archive_dir:
+        os.makedirs(archive_dir, exist_ok=True)
+
+    archived = []
+    for month in sorted(shipments):
+        if month >= cutoff:
+            break
+        month_tables = [(items_table, items.get(month)),
+                        (shipment_table, shipments[month])]
+        try:
+            # Позиции отсоединяются первыми и теряют внешний ключ на
+            # shipment, иначе отсоединить секцию отгрузок не получится.
+            for table, name in month_tables:
+                if name is None:
+                    continue
+                await db.execute(text(
+                    f'ALTER TABLE {table} DETACH PARTITION {name}'))
+                if table == items_table:
+                    await db.execute(text(
+                        f'ALTER TABLE {name} DROP CONSTRAINT IF EXISTS '
+                        f'{SHIPMENT_ITEMS_SHIPMENT_FKEY}'))
+            for _, name in month_tables:
+                if name is None:
+                    continue
+                if archive_dir:
+                    await export_table(
+                        db, name, os.path.join(archive_dir,
+                                               f'{name}.csv.gz'))
+                if drop:
+                    await db.execute(text(f'DROP TABLE {name}'))
+                archived.append(name)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            logger.exception('Archiving partitions for %s failed', month)
+            raise
+    return archived
@@ -0,0 +1,77 @@
+import base64
+import json
+from typing import Optional
+
+from sqlalchemy import and_, func, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.constants import PRODUCT_SEARCH_COLUMNS
+from core.models.models import Product
+
+LIKE_ESCAPE = '\\'
+
+SearchCursor = tuple[float, int]
+
+
+def encode_cursor(rank: float, product_id: int) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps([rank, product_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> SearchCursor:
+    """Разбирает курсор следующей страницы, ValueError - если он испорчен."""
+    try:
+        rank, product_id = json.loads(base64.urlsafe_b64decode(cursor))
+    except (ValueError, TypeError) as error:
+        raise ValueError(cursor) from error
+    if (not isinstance(rank, (int, float))
+            or not isinstance(product_id, int)):
+        raise ValueError(cursor)
+    return float(rank), product_id
+
+
+def escape_like(value: str) -> str:
+    return (value.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+            .replace('%', LIKE_ESCAPE + '%').replace('_', LIKE_ESCAPE + '_'))
+
+
+async def search_products(
+        db: AsyncSession,
+        query: str,
+        limit: int,
+        after: Optional[SearchCursor] = None
+) -> tuple[list[dict], Optional[str]]:
+    """
+    Нечеткий поиск по названию, модели и серийному номеру. Кандидаты
+    отбираются по триграммным GIN-индексам (<% и ILIKE по подстроке),
+    сортируются по word_similarity и листаются курсором (ранг, id).
+    Возвращает страницу и курсор следующей страницы.
+    """
+    columns = [getattr(Product, column) for column in PRODUCT_SEARCH_COLUMNS]
+    pattern = f'%{escape_like(query)}%'
+    rank = func.greatest(*(func.word_similarity(query, column)
+                           for column in columns)).label('rank')
+    ranked = (
+        select(Product.id, Product.product_uuid,
+               Product.product_name.label('name'), Product.name_model,
+               Product.serial_number, Product.status, rank)
+        .where(or_(*(literal(query).op('<%')(column) for column in columns),
+                   *(column.ilike(pattern, escape=LIKE_ESCAPE)
+                     for column in columns)))
+        .subquery()
+    )
+    page_query = (select(ranked)
+                  .order_by(ranked.c.rank.desc(), ranked.c.id)
+                  .limit(limit + 1))
+    if after is not None:
+        after_rank, after_id = after
+        page_query = page_query.where(or_(
+            ranked.c.rank < after_rank,
+            and_(ranked.c.rank == after_rank, ranked.c.id > after_id)))
+
+    rows = [dict(row._mapping) for row in await db.execute(page_query)]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['rank'], rows[-1]['id'])
+    return rows, next_cursor
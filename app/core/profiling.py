@@ -0,0 +1,173 @@
+import asyncio
+import collections
+import datetime
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core.constants import (SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG_SIZE,
+                            SLOW_QUERY_STATEMENT_MAX_LENGTH,
+                            PROFILE_SAMPLE_INTERVAL)
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_PREFIX = 'EXPLAIN (ANALYZE, BUFFERS) '
+
+
+class StackSampler:
+    """
+    Семплирующий профилировщик: отдельный поток раз в interval секунд
+    снимает стек потока, в котором был создан, и копит их в формате
+    folded stacks (flamegraph.pl, speedscope, inferno).
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._target_thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} '
+                             f'({os.path.basename(code.co_filename)}'
+                             f':{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def to_folded(self) -> str:
+        return ''.join(f'{stack} {count}\n'
+                       for stack, count in self.samples.most_common())
+
+
+def describe_parameters(parameters: Any) -> Any:
+    """Описывает форму параметров запроса без самих значений."""
+    if isinstance(parameters, dict):
+        return {key: describe_parameters(value)
+                for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and all(isinstance(row, (list, tuple, dict))
+                              for row in parameters):
+            return {'rows': len(parameters),
+                    'row': describe_parameters(parameters[0])}
+        return [describe_value(value) for value in parameters]
+    return describe_value(parameters)
+
+
+def describe_value(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return f'{type(value).__name__}[{len(value)}]'
+    if isinstance(value, (str, bytes)):
+        return f'{type(value).__name__}({len(value)})'
+    return type(value).__name__
+
+
+def is_read_only(statement: str) -> bool:
+    """
+    EXPLAIN ANALYZE выполняет запрос, поэтому планы снимаются только для
+    простых SELECT: без CTE (они могут изменять данные) и без блокировок.
+    """
+    normalized = statement.lstrip().lower()
+    return normalized.startswith('select') and ' for update' not in normalized
+
+
+class SlowQueryLog:
+    """
+    Кольцевой буфер медленных запросов. Подключается к движку через
+    before_cursor_execute/after_cursor_execute; для медленных SELECT
+    фоном снимается EXPLAIN (ANALYZE, BUFFERS) на отдельном соединении.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_THRESHOLD_MS,
+                 size: int = SLOW_QUERY_LOG_SIZE, explain: bool = True):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.entries = collections.deque(maxlen=size)
+        self._engine: Optional[AsyncEngine] = None
+        self._explain_lock = asyncio.Lock()
+
+    def install(self, engine: AsyncEngine):
+        self._engine = engine
+        event.listen(engine.sync_engine, 'before_cursor_execute',
+                     self._before_cursor_execute)
+        event.listen(engine.sync_engine, 'after_cursor_execute',
+                     self._after_cursor_execute)
+
+    def clear(self):
+        self.entries.clear()
+
+    def snapshot(self) -> list[dict]:
+        return list(reversed(self.entries))
+
+    def _before_cursor_execute(self, connection, cursor, statement,
+                               parameters, context, executemany):
+        connection.info.setdefault('query_started', []).append(
+            time.perf_counter())
+
+    def _after_cursor_execute(self, connection, cursor, statement,
+                              parameters, context, executemany):
+        started = connection.info['query_started'].pop()
+        duration_ms = (time.perf_counter() - started) * 1000
+        if (duration_ms < self.threshold_ms
+                or statement.startswith(EXPLAIN_PREFIX)):
+            return
+        entry = {
+            'recorded_at': datetime.datetime.now(datetime.UTC).isoformat(),
+            'duration_ms': round(duration_ms, 2),
+            'statement': statement[:SLOW_QUERY_STATEMENT_MAX_LENGTH],
+            'parameters': describe_parameters(parameters),
+            'executemany': executemany,
+            'plan': None,
+        }
+        self.entries.append(entry)
+        if self.explain and not executemany and is_read_only(statement):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            loop.create_task(self._capture_plan(entry, statement, parameters))
+
+    async def _capture_plan(self, entry: dict, statement: str,
+                            parameters: Any):
+        if self._explain_lock.locked():
+            entry['plan'] = 'skipped: another plan is being captured'
+            return
+        async with self._explain_lock:
+            try:
+                async with self._engine.connect() as connection:
+                    result = await connection.exec_driver_sql(
+                        EXPLAIN_PREFIX + statement, parameters)
+                    entry['plan'] = '\n'.join(
+                        row[0] for row in result.all())
+                    await connection.rollback()
+            except Exception as error:
+                logger.warning('Could not capture plan: %s', error)
+                entry['plan'] = f'failed: {error}'
+
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=float(os.getenv('SLOW_QUERY_THRESHOLD_MS',
+                                 SLOW_QUERY_THRESHOLD_MS)),
+    explain=os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true')
@@ -1,17 +1,30 @@
 import datetime
-from typing import Annotated
+import functools
+from typing import Annotated, Optional, Type
 
-from pydantic import BaseModel, fields, ConfigDict, field_validator
+from pydantic import (BaseModel, fields, ConfigDict, field_validator,
+                      create_model)
 from core.constants import (PRODUCTION_BATCHES_REGEX,
                             PRODUCTION_BATCHES_DESCRIPTION_STATUS,
                             PRODUCT_DESCRIPTION_STATUS, PRODUCT_REGEX,
-                            SHIPMENTS_REGEX, SHIPMENTS_DESCRIPTION_STATUS)
+                            SHIPMENTS_REGEX, SHIPMENTS_DESCRIPTION_STATUS,
+                            SHIPMENT_MAX_ITEMS, ALLOCATION_MAX_PRODUCTS)
 
 
 class BaseConfigModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+@functools.lru_cache(maxsize=None)
+def sparse_schema(schema: Type[BaseConfigModel],
+                  field_names: tuple[str, ...]) -> Type[BaseConfigModel]:
+    """Схема ответа только с запрошенными полями schema."""
+    return create_model(
+        f'{schema.__name__}Sparse', __base__=BaseConfigModel,
+        **{name: (schema.model_fields[name].annotation, ...)
+           for name in field_names})
+
+
 class ProductGet(BaseConfigModel):
     id: int
     product_uuid: str
@@ -20,6 +33,26 @@ class ProductGet(BaseConfigModel):
     status: str
 
 
+class ProductSearchGet(ProductGet):
+    serial_number: str
+    rank: float
+
+
+class ProductSearchPage(BaseConfigModel):
+    products: list[ProductSearchGet]
+    next_cursor: Optional[str] = None
+
+
+class ProductImport(BaseConfigModel):
+    product_uuid: Annotated[str, fields.Field(min_length=1, max_length=255)]
+    product_name: Annotated[str, fields.Field(min_length=1, max_length=255)]
+    serial_number: Annotated[str, fields.Field(min_length=1, max_length=255)]
+    name_model: Annotated[str, fields.Field(min_length=1, max_length=255)]
+    status: Annotated[str, fields.Field(
+        pattern=PRODUCT_REGEX, default='IN_PRODUCTION',
+        description=PRODUCT_DESCRIPTION_STATUS)]
+
+
 class WarehouseInventoryPut(BaseConfigModel):
     storage_location: Annotated[str, fields.Field(
         min_length=2, max_length=55)]
@@ -72,7 +105,52 @@ class ShipmentEntity(BaseConfigModel):
 
 
 class ShipmentPost(ShipmentEntity):
-    items: list[ItemBatchesSchema]
+    items: Annotated[list[ItemBatchesSchema], fields.Field(
+        max_length=SHIPMENT_MAX_ITEMS)]
+
+    @field_validator('items')
+    @classmethod
+    def deduplicate_items(
+            cls, items: list[ItemBatchesSchema]) -> list[ItemBatchesSchema]:
+        unique_items = {}
+        for item in items:
+            unique_items.setdefault(item.batch_id, item)
+        return list(unique_items.values())
+
+
+class AllocationItemSchema(BaseConfigModel):
+    product_id: int = fields.Field(gt=0)
+    quantity: int = fields.Field(gt=0)
+
+
+class ShipmentAllocationPost(ShipmentEntity):
+    items: Annotated[list[AllocationItemSchema], fields.Field(
+        min_length=1, max_length=ALLOCATION_MAX_PRODUCTS)]
+    storage_location: Annotated[Optional[str], fields.Field(
+        default=None, min_length=2, max_length=55,
+        description='Предпочтительное место хранения')]
+
+    @field_validator('items')
+    @classmethod
+    def merge_items(
+            cls, items: list[AllocationItemSchema]
+    ) -> list[AllocationItemSchema]:
+        quantities = {}
+        for item in items:
+            quantities[item.product_id] = (
+                quantities.get(item.product_id, 0) + item.quantity)
+        return [AllocationItemSchema(product_id=product_id,
+                                     quantity=quantity)
+                for product_id, quantity in quantities.items()]
+
+
+class ProductDailyStatsGet(BaseConfigModel):
+    product_id: int
+    day: datetime.date
+    batches_started: int
+    units_completed: int
+    units_received: int
+    units_shipped: int
 
 
 class HealthCheck(BaseModel):
@@ -1,16 +1,49 @@
+import asyncio
+import contextlib
+import os
 from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
 
-from api.v1.endpoints import products, production_batches, warehouse, healthcheck
+from api.v1.endpoints import (products, production_batches, warehouse,
+                              analytics, admin, healthcheck)
+from core.constants import (ANALYTICS_REFRESH_SECONDS, PARTITION_MONTHS_AHEAD,
+                            PARTITION_MAINTENANCE_SECONDS)
+from core.models.analytics import refresh_daily_stats_periodically
+from core.models.partitions import ensure_shipment_partitions_periodically
 from core.models.db import sessionmanager
+from core.events import broker
+from core.models.group_commit import stage_update_batcher
+from core.profiling import slow_query_log
 from api.v1 import api
+from api.profiling import profile_request
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
+    partitions_task = asyncio.create_task(
+        ensure_shipment_partitions_periodically(
+            sessionmanager, PARTITION_MONTHS_AHEAD,
+            float(os.getenv('PARTITION_MAINTENANCE_SECONDS',
+                            PARTITION_MAINTENANCE_SECONDS))))
+    refresh_interval = float(os.getenv('ANALYTICS_REFRESH_SECONDS',
+                                       ANALYTICS_REFRESH_SECONDS))
+    refresh_task = None
+    if refresh_interval > 0:
+        refresh_task = asyncio.create_task(
+            refresh_daily_stats_periodically(sessionmanager, refresh_interval))
+    await broker.start()
+    await stage_update_batcher.start()
     yield
+    await stage_update_batcher.stop()
+    await broker.stop()
+    for task in (refresh_task, partitions_task):
+        if task is None:
+            continue
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
     if sessionmanager._engine is not None:
         await sessionmanager.close()
 
@@ -20,9 +53,14 @@ app = FastAPI(lifespan=lifespan, title='Storage', docs_url='/api/docs',
 
 api_start = api
 
+slow_query_log.install(sessionmanager._engine)
+app.middleware('http')(profile_request)
+
 app.include_router(products)
 app.include_router(production_batches)
 app.include_router(warehouse)
+app.include_router(analytics)
+app.include_router(admin)
 app.include_router(healthcheck)
 
 
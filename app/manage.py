@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import json
+from typing import Optional
+
+from core.constants import (IMPORT_FORMATS, PARTITION_MONTHS_AHEAD,
+                            SHIPMENT_ARCHIVE_AFTER_MONTHS,
+                            EVENTS_RETENTION_DAYS)
+from core.models.db import sessionmanager
+from core.models.ingest import import_products, iter_file_chunks
+from core.models.analytics import refresh_daily_stats
+from core.models.partitions import (ensure_shipment_partitions,
+                                    archive_shipment_partitions)
+from core.events import prune_events
+from api.cache import invalidate_cache
+
+
+async def run_import_products(path: str, import_format: str):
+    """Загружает каталог продуктов из файла."""
+    async with sessionmanager.session() as db:
+        report = await import_products(
+            db=db, chunks=iter_file_chunks(path),
+            import_format=import_format)
+        await db.commit()
+    await invalidate_cache('all_products', 'product')
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+async def run_refresh_analytics():
+    """Пересчитывает дневные агрегаты для затронутых корзин."""
+    async with sessionmanager.session() as db:
+        refreshed = await refresh_daily_stats(db)
+    if refreshed is None:
+        print('Refresh is already running in another process.')
+    else:
+        print(f'Refreshed {refreshed} product/day buckets.')
+
+
+async def run_partitions(months_ahead: int, archive_after: Optional[int],
+                         archive_dir: Optional[str], keep_detached: bool):
+    """Создает будущие секции отгрузок и архивирует старые."""
+    async with sessionmanager.session() as db:
+        created = await ensure_shipment_partitions(db, months_ahead)
+        archived = []
+        if archive_after is not None:
+            archived = await archive_shipment_partitions(
+                db, older_than_months=archive_after,
+                archive_dir=archive_dir, drop=not keep_detached)
+    print(json.dumps({'created': created, 'archived': archived},
+                     indent=2))
+
+
+async def run_prune_events(older_than_days: int):
+    """Чистит журнал ленты событий."""
+    async with sessionmanager.session() as db:
+        removed = await prune_events(db, older_than_days)
+    print(f'Removed {removed} inventory events.')
+
+
+def detect_file_format(path: str) -> str:
+    """Определяет формат файла по расширению."""
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description='Служебные команды склада Etalon.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser(
+        'import-products', help='Загрузить каталог продуктов из CSV/NDJSON.')
+    import_parser.add_argument('path')
+    import_parser.add_argument(
+        '--format', choices=sorted(set(IMPORT_FORMATS.values())),
+        help='Формат файла, по умолчанию определяется по расширению.')
+
+    commands.add_parser(
+        'refresh-analytics',
+        help='Пересчитать дневные агрегаты для затронутых корзин.')
+
+    partitions_parser = commands.add_parser(
+        'partitions',
+        help='Создать будущие секции отгрузок и архивировать старые.')
+    partitions_parser.add_argument(
+        '--months-ahead', type=int, default=PARTITION_MONTHS_AHEAD,
+        help='На сколько месяцев вперед создавать секции.')
+    partitions_parser.add_argument(
+        '--archive-older-than', type=int, metavar='MONTHS',
+        const=SHIPMENT_ARCHIVE_AFTER_MONTHS, nargs='?',
+        help='Отсоединить секции старше указанного числа месяцев.')
+    partitions_parser.add_argument(
+        '--archive-dir',
+        help='Каталог для выгрузки отсоединенных секций в .csv.gz.')
+    partitions_parser.add_argument(
+        '--keep-detached', action='store_true',
+        help='Не удалять отсоединенные таблицы; без --archive-dir '
+             'обязателен.')
+
+    prune_parser = commands.add_parser(
+        'prune-events', help='Удалить старые события ленты изменений.')
+    prune_parser.add_argument(
+        '--older-than-days', type=int, default=EVENTS_RETENTION_DAYS)
+    return parser
+
+
+async def main(args: argparse.Namespace):
+    try:
+        if args.command == 'import-products':
+            await run_import_products(
+                args.path, args.format or detect_file_format(args.path))
+        elif args.command == 'refresh-analytics':
+            await run_refresh_analytics()
+        elif args.command == 'partitions':
+            await run_partitions(
+                args.months_ahead, args.archive_older_than,
+                args.archive_dir, args.keep_detached)
+        elif args.command == 'prune-events':
+            await run_prune_events(args.older_than_days)
+    finally:
+        await sessionmanager.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = build_parser()
+    args = parser.parse_args()
+    if (args.command == 'partitions' and args.archive_older_than is not None
+            and not args.archive_dir and not args.keep_detached):
+        parser.error('--archive-older-than drops detached partitions and '
+                     'requires --archive-dir (or --keep-detached)')
+    return args
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from core.models.group_commit import StageUpdateBatcher, split_into_rounds
+
+
+class FakeSession:
+    """Выполняет UPDATE_STAGES над словарем стадий в памяти."""
+
+    def __init__(self, stages: dict[int, str], error: Exception = None):
+        self.stages = stages
+        self.error = error
+        self.executed = []
+        self.commits = 0
+
+    async def execute(self, _statement, params):
+        if self.error is not None:
+            raise self.error
+        self.executed.append(params)
+        rows = []
+        for batch_id, stage in zip(params['batch_ids'], params['stages']):
+            if batch_id not in self.stages:
+                continue
+            rows.append(SimpleNamespace(
+                id=batch_id, current_stage=stage,
+                previous_stage=self.stages[batch_id]))
+            self.stages[batch_id] = stage
+        return rows
+
+    async def commit(self):
+        self.commits += 1
+
+
+class FakeSessionManager:
+    def __init__(self, session: FakeSession):
+        self._session = session
+
+    @contextlib.asynccontextmanager
+    async def session(self):
+        yield self._session
+
+
+def pending_update(batch_id: int, stage: str):
+    return batch_id, stage, asyncio.get_running_loop().create_future()
+
+
+def test_split_into_rounds_keeps_order_per_batch():
+    pending = [(1, 'A', None), (2, 'B', None), (1, 'C', None),
+               (3, 'D', None), (1, 'E', None), (2, 'F', None)]
+
+    rounds = split_into_rounds(pending)
+
+    assert [[(batch_id, stage) for batch_id, stage, _ in round_updates]
+            for round_updates in rounds] == [
+        [(1, 'A'), (2, 'B'), (3, 'D')],
+        [(1, 'C'), (2, 'F')],
+        [(1, 'E')],
+    ]
+
+
+def test_flush_resolves_each_caller_with_its_own_row():
+    async def scenario():
+        session = FakeSession({1: 'INITIALIZED', 2: 'INITIALIZED'})
+        batcher = StageUpdateBatcher(FakeSessionManager(session))
+        pending = [pending_update(1, 'PRODUCTION_STARTED'),
+                   pending_update(2, 'COMPLETED'),
+                   pending_update(1, 'COMPLETED')]
+
+        await batcher.flush(pending)
+
+        rows = [future.result() for _, _, future in pending]
+        assert [(row.id, row.previous_stage, row.current_stage)
+                for row in rows] == [
+            (1, 'INITIALIZED', 'PRODUCTION_STARTED'),
+            (2, 'INITIALIZED', 'COMPLETED'),
+            (1, 'PRODUCTION_STARTED', 'COMPLETED'),
+        ]
+        assert len(session.executed) == 2
+        assert session.commits == 1
+
+    asyncio.run(scenario())
+
+
+def test_flush_sets_404_for_missing_batch():
+    async def scenario():
+        session = FakeSession({1: 'INITIALIZED'})
+        batcher = StageUpdateBatcher(FakeSessionManager(session))
+        pending = [pending_update(1, 'COMPLETED'),
+                   pending_update(404, 'COMPLETED')]
+        found, missing = pending
+
+        await batcher.flush(pending)
+
+        assert found[2].result().id == 1
+        with pytest.raises(HTTPException) as error:
+            missing[2].result()
+        assert error.value.status_code == 404
+
+    asyncio.run(scenario())
+
+
+def test_failed_group_rejects_every_pending_update():
+    async def scenario():
+        session = FakeSession({1: 'INITIALIZED', 2: 'INITIALIZED'},
+                              error=RuntimeError('connection lost'))
+        batcher = StageUpdateBatcher(FakeSessionManager(session),
+                                     enabled=True, window_ms=50)
+        await batcher.start()
+        try:
+            results = await asyncio.wait_for(asyncio.gather(
+                batcher.submit(1, 'COMPLETED'),
+                batcher.submit(2, 'COMPLETED'),
+                return_exceptions=True), timeout=5)
+        finally:
+            await batcher.stop()
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert len(results) == 2
+
+    asyncio.run(scenario())
+
+
+def test_batcher_keeps_working_after_failed_group():
+    async def scenario():
+        session = FakeSession({1: 'INITIALIZED'},
+                              error=RuntimeError('connection lost'))
+        batcher = StageUpdateBatcher(FakeSessionManager(session),
+                                     enabled=True, window_ms=1)
+        await batcher.start()
+        try:
+            with pytest.raises(RuntimeError):
+                await asyncio.wait_for(
+                    batcher.submit(1, 'COMPLETED'), timeout=5)
+            session.error = None
+            row = await asyncio.wait_for(
+                batcher.submit(1, 'COMPLETED'), timeout=5)
+        finally:
+            await batcher.stop()
+
+        assert row.previous_stage == 'INITIALIZED'
+
+    asyncio.run(scenario())
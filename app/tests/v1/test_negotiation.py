@@ -0,0 +1,120 @@
+import asyncio
+
+from starlette.requests import Request
+
+from api import negotiation
+from api.negotiation import (parse_quality_list, negotiate_format,
+                             negotiate_encoding, to_columnar)
+
+
+def test_parse_quality_list_sorts_by_quality_then_position():
+    parsed = parse_quality_list(
+        'application/json;q=0.5, application/msgpack, text/html;q=0.5')
+
+    assert parsed == [('application/msgpack', 1.0),
+                      ('application/json', 0.5),
+                      ('text/html', 0.5)]
+
+
+def test_parse_quality_list_handles_empty_and_broken_values():
+    assert parse_quality_list(None) == []
+    assert parse_quality_list(' , ') == []
+    assert parse_quality_list('gzip;q=abc') == [('gzip', 0.0)]
+
+
+def test_negotiate_format():
+    assert negotiate_format(None) == 'json'
+    assert negotiate_format('text/html') == 'json'
+    assert negotiate_format('application/msgpack') == 'msgpack'
+    assert negotiate_format('application/vnd.msgpack;q=0.9, */*;q=0.1') == (
+        'msgpack')
+    assert negotiate_format(
+        'application/vnd.etalon.columnar+json') == 'columnar'
+    assert negotiate_format(
+        'application/msgpack;q=0, application/json') == 'json'
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding('identity') is None
+    assert negotiate_encoding('gzip, br') == 'br'
+    assert negotiate_encoding('gzip, br;q=0') == 'gzip'
+    assert negotiate_encoding('*') == 'br'
+    assert negotiate_encoding('*, br;q=0') == 'gzip'
+
+
+def test_to_columnar():
+    payload = {'inventory': [{'product_id': 1, 'stock_quantity': 5},
+                             {'product_id': 2, 'stock_quantity': 0}]}
+
+    assert to_columnar(payload) == {
+        'inventory': {'product_id': [1, 2], 'stock_quantity': [5, 0]}}
+    assert to_columnar([]) == {}
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def hset(self, key, mapping):
+        self.redis.hashes[key] = mapping
+
+    def pexpire(self, key, ttl_ms):
+        self.redis.ttls[key] = ttl_ms
+
+    async def execute(self):
+        pass
+
+
+class FakeRedis:
+    """Хранит хеши вариантов и их TTL в памяти."""
+
+    def __init__(self, ttls: dict[str, int]):
+        self.ttls = ttls
+        self.hashes = {}
+
+    async def hgetall(self, key):
+        return {}
+
+    async def pttl(self, key):
+        return self.ttls.get(key, -2)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+def negotiate(monkeypatch, fake_redis: FakeRedis):
+    monkeypatch.setattr(negotiation, 'binary_redis', fake_redis)
+    request = Request({'type': 'http', 'headers': [
+        (b'accept', b'application/msgpack')]})
+
+    async def load_payload():
+        return {'inventory': []}
+
+    return asyncio.run(negotiation.negotiated_response(
+        request=request, cache_key='warehouse_inventory',
+        load_payload=load_payload))
+
+
+def test_variant_expires_with_base_key(monkeypatch):
+    fake_redis = FakeRedis({'warehouse_inventory': 1500})
+
+    response = negotiate(monkeypatch, fake_redis)
+
+    assert response.status_code == 200
+    assert fake_redis.ttls['warehouse_inventory:msgpack:identity'] == 1500
+
+
+def test_variant_not_cached_without_base_key(monkeypatch):
+    fake_redis = FakeRedis({})
+
+    response = negotiate(monkeypatch, fake_redis)
+
+    assert response.status_code == 200
+    assert fake_redis.hashes == {}
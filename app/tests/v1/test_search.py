@@ -0,0 +1,39 @@
+import base64
+
+import pytest
+
+from core.models.search import encode_cursor, decode_cursor, escape_like
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(0.30000001192092896, 42)
+
+    assert decode_cursor(cursor) == (0.30000001192092896, 42)
+
+
+def test_decode_cursor_accepts_integer_rank():
+    assert decode_cursor(encode_cursor(1, 7)) == (1.0, 7)
+
+
+@pytest.mark.parametrize('payload', [
+    b'{"rank": 1}',
+    b'[1]',
+    b'[1, 2, 3]',
+    b'["high", 1]',
+    b'[0.5, "1"]',
+    b'not json',
+])
+def test_decode_cursor_rejects_malformed_payload(payload):
+    with pytest.raises(ValueError):
+        decode_cursor(base64.urlsafe_b64encode(payload).decode())
+
+
+@pytest.mark.parametrize('cursor', ['%%%', 'абв', 'a'])
+def test_decode_cursor_rejects_invalid_base64(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_escape_like():
+    assert escape_like('50%_off\\') == '50\\%\\_off\\\\'
+    assert escape_like('plain') == 'plain'
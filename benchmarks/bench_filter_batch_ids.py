@@ -0,0 +1,88 @@
+"""
+Сравнивает проверку партий заказа через IN (параметр на каждый ID) и через
+один параметр-массив (= ANY(:batch_ids)) на заказах разного размера.
+
+    export DATABASE_URL=postgresql+asyncpg://...
+    python benchmarks/bench_filter_batch_ids.py
+
+Данные создаются во временной таблице и удаляются вместе с транзакцией.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import Column, Integer, MetaData, Table, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.models.crud import batch_ids_param  # noqa: E402
+
+load_dotenv()
+
+ORDER_SIZES = (10, 100, 1_000, 10_000, 100_000)
+
+bench_inventory = Table(
+    'bench_inventory', MetaData(),
+    Column('batch_id', Integer, primary_key=True),
+    prefixes=['TEMPORARY'])
+
+
+def in_list_query(batch_ids):
+    return select(bench_inventory.c.batch_id).where(
+        bench_inventory.c.batch_id.in_(batch_ids))
+
+
+def any_array_query(batch_ids):
+    return select(bench_inventory.c.batch_id).where(
+        bench_inventory.c.batch_id == batch_ids_param(batch_ids))
+
+
+async def measure(connection, build_query, batch_ids, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        async with connection.begin_nested():
+            result = await connection.execute(build_query(batch_ids))
+            found = len(result.scalars().all())
+        timings.append(time.perf_counter() - started)
+    assert found == len(batch_ids)
+    return statistics.median(timings) * 1000
+
+
+async def main(repeat: int):
+    engine = create_async_engine(os.getenv('DATABASE_URL'))
+    async with engine.connect() as connection:
+        await connection.begin()
+        await connection.run_sync(bench_inventory.metadata.create_all)
+        await connection.execute(text(
+            'INSERT INTO bench_inventory '
+            'SELECT generate_series(1, :rows)'),
+            {'rows': max(ORDER_SIZES) * 2})
+        await connection.execute(text('ANALYZE bench_inventory'))
+
+        print(f'{"batch ids":>10} {"IN, ms":>12} {"= ANY, ms":>12}')
+        for size in ORDER_SIZES:
+            batch_ids = list(range(1, size * 2, 2))
+            row = []
+            for build_query in (in_list_query, any_array_query):
+                try:
+                    elapsed = await measure(connection, build_query,
+                                            batch_ids, repeat)
+                    row.append(f'{elapsed:12.2f}')
+                except Exception as error:
+                    row.append(f'{type(error).__name__:>12}')
+            print(f'{size:>10} {row[0]} {row[1]}')
+        await connection.rollback()
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    asyncio.run(main(parser.parse_args().repeat))
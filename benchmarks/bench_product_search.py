@@ -0,0 +1,72 @@
+"""
+Замеряет поиск по каталогу (search_products) на миллионе продуктов.
+
+    export DATABASE_URL=postgresql+asyncpg://...
+    python benchmarks/bench_product_search.py
+
+Требует применённых миграций (pg_trgm и GIN-индексы). Продукты
+добавляются в транзакции, которая в конце откатывается.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.models.db import DatabaseSessionManager  # noqa: E402
+from core.models.search import search_products  # noqa: E402
+
+load_dotenv()
+
+GENERATE_PRODUCTS = '''
+    INSERT INTO products (product_uuid, product_name, serial_number,
+                          name_model, status)
+    SELECT 'bench-' || n, 'Bench Maker ' || n, 'BSN' || md5(n::text),
+           'Bench Model ' || to_hex(n * 7919), 'IN_STOCK'
+    FROM generate_series(1, :rows) AS n
+'''
+QUERIES = ('Maker 4242', 'Model 1f2e', 'BSN9e3', 'Bnch Modl', 'CyberTruck')
+
+
+async def measure(db, query, limit, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        found, next_cursor = await search_products(db, query, limit)
+        if next_cursor is not None:
+            await search_products(db, query, limit,
+                                  after=(found[-1]['rank'], found[-1]['id']))
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, len(found)
+
+
+async def main(args: argparse.Namespace):
+    manager = DatabaseSessionManager(os.getenv('DATABASE_URL'), {})
+    async with manager.session() as db:
+        started = time.perf_counter()
+        await db.execute(text(GENERATE_PRODUCTS), {'rows': args.rows})
+        await db.execute(text('ANALYZE products'))
+        print(f'generated {args.rows} products in '
+              f'{time.perf_counter() - started:.1f} s')
+
+        print(f'{"query":>14} {"found":>6} {"2 pages, ms":>12}')
+        for query in QUERIES:
+            elapsed, found = await measure(db, query, args.limit, args.repeat)
+            print(f'{query:>14} {found:>6} {elapsed:12.2f}')
+        await db.rollback()
+    await manager.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
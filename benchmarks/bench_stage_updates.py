@@ -0,0 +1,114 @@
+"""
+Сравнивает пропускную способность смены стадий партий: отдельная
+транзакция на каждое обновление (как modify_production_batch_status)
+против групповой фиксации через StageUpdateBatcher.
+
+    export DATABASE_URL=postgresql+asyncpg://...
+    python benchmarks/bench_stage_updates.py
+
+Для замера создаются временные партии первого продукта из каталога,
+после замера они удаляются.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, insert, select
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from core.constants import PRODUCTION_BATCHES_STATUSES  # noqa: E402
+from core.models.db import DatabaseSessionManager  # noqa: E402
+from core.models.models import Product, ProductionBatches  # noqa: E402
+from core.models.group_commit import StageUpdateBatcher  # noqa: E402
+
+load_dotenv()
+
+
+async def create_batches(manager, count: int) -> list[int]:
+    async with manager.session() as db:
+        product_id = (await db.execute(select(Product.id).limit(1))).scalar()
+        if product_id is None:
+            raise SystemExit('products table is empty, load init.sql first')
+        result = await db.execute(
+            insert(ProductionBatches).returning(ProductionBatches.id),
+            [{'product_id': product_id, 'quantity_in_batch': 1,
+              'current_stage': 'INITIALIZED'} for _ in range(count)])
+        batch_ids = list(result.scalars())
+        await db.commit()
+    return batch_ids
+
+
+async def drop_batches(manager, batch_ids: list[int]):
+    async with manager.session() as db:
+        await db.execute(delete(ProductionBatches).where(
+            ProductionBatches.id.in_(batch_ids)))
+        await db.commit()
+
+
+async def per_request_update(manager, batch_id: int, stage: str):
+    async with manager.session() as db:
+        batch = await db.get(ProductionBatches, batch_id)
+        batch.current_stage = stage
+        await db.commit()
+
+
+async def run_updates(update, batch_ids, total: int, concurrency: int):
+    stages = itertools.cycle(PRODUCTION_BATCHES_STATUSES)
+    targets = itertools.cycle(batch_ids)
+    jobs = [(next(targets), next(stages)) for _ in range(total)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(batch_id, stage):
+        async with semaphore:
+            await update(batch_id, stage)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(batch_id, stage)
+                           for batch_id, stage in jobs))
+    return total / (time.perf_counter() - started)
+
+
+async def main(args: argparse.Namespace):
+    manager = DatabaseSessionManager(
+        os.getenv('DATABASE_URL'), {'pool_size': args.concurrency})
+    batch_ids = await create_batches(manager, args.batches)
+    try:
+        per_request = await run_updates(
+            lambda batch_id, stage: per_request_update(
+                manager, batch_id, stage),
+            batch_ids, args.updates, args.concurrency)
+        print(f'per-request commit: {per_request:10.1f} updates/s')
+
+        for window_ms in args.windows:
+            batcher = StageUpdateBatcher(
+                manager, enabled=True, window_ms=window_ms,
+                max_batch=args.max_batch)
+            await batcher.start()
+            try:
+                grouped = await run_updates(
+                    batcher.submit, batch_ids, args.updates,
+                    args.concurrency)
+            finally:
+                await batcher.stop()
+            print(f'group commit {window_ms:>4} ms: '
+                  f'{grouped:10.1f} updates/s')
+    finally:
+        await drop_batches(manager, batch_ids)
+        await manager.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batches', type=int, default=1000)
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--max-batch', type=int, default=100)
+    parser.add_argument('--windows', type=float, nargs='+',
+                        default=[2, 5, 10])
+    asyncio.run(main(parser.parse_args()))